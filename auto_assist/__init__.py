@@ -1,24 +1,25 @@
-import fire
-
-from .config import ConfigCmd
-from .browser import BrowserCmd
-from .domain.google_scholar import GsCmd
-from .domain.hunter import HunterCmd
+# subcommands are imported when they are used, so that a command doesn't pay for
+# the heavy dependencies of the others, e.g. pandas, openai and playwright
 
 
 class MainCmd:
     def config(self):
+        from .config import ConfigCmd
         return ConfigCmd
 
     def browser(self):
+        from .browser import BrowserCmd
         return BrowserCmd
 
     def gs(self):
+        from .domain.google_scholar import GsCmd
         return GsCmd
 
     def hunter(self):
+        from .domain.hunter import HunterCmd
         return HunterCmd
 
 
 def main():
+    import fire
     fire.Fire(MainCmd)
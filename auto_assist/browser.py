@@ -1,13 +1,256 @@
-from playwright.async_api import Playwright
+from playwright.async_api import Playwright, BrowserContext, Page, Route, Error as PlaywrightError
 from playwright.async_api import async_playwright
 from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from collections import Counter
+from urllib.parse import urlparse
 
 import asyncio
 import json
+import time
 import os
 
+from .lib import get_logger
 
-def launch_browser(browser_dir: str, channel='chrome', **kwargs):
+logger = get_logger(__name__)
+
+
+# resource types of requests that are not needed to scrape text
+DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font')
+
+# analytics, ads and trackers
+DEFAULT_BLOCKED_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'googleadservices.com', 'adservice.google.com', 'facebook.net', 'connect.facebook.net',
+    'hotjar.com', 'clarity.ms', 'scorecardresearch.com', 'quantserve.com', 'nr-data.net',
+    'segment.io', 'segment.com', 'mixpanel.com', 'addthis.com', 'sharethis.com', 'adsrvr.org',
+    'crazyegg.com', 'siteimprove.com', 'siteimproveanalytics.com', 'matomo.cloud',
+)
+
+
+class BrowserPool:
+    """
+    A browser context and its pages that live through the whole run
+
+    A row that fails is retried on its own with the same worker,
+    only a crashed page is replaced and the context is relaunched only if it is closed,
+    so a bad page doesn't cost a browser cold start and a rescan of all rows.
+
+    :param launcher: async function that accept Playwright and return a BrowserContext, e.g. launch_browser(...)
+    :param size: int
+        The number of pages, one worker per page
+    """
+
+    def __init__(self, launcher: Callable[[Playwright], Awaitable[BrowserContext]], size=1):
+        self._launcher = launcher
+        self._size = max(1, size)
+        self._pw: Optional[Playwright] = None
+        self._context: Optional[BrowserContext] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._crashed: set = set()
+        self.recycled_pages = 0
+        self.relaunches = 0
+
+    async def __aenter__(self):
+        self._pw = await async_playwright().start()
+        await self._launch()
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            if self._context is not None:
+                await self._context.close()
+        except PlaywrightError:
+            pass
+        finally:
+            await self._pw.stop()  # type: ignore
+
+    async def open_pages(self) -> List[Page]:
+        return await open_pages(self._context, self._size)  # type: ignore
+
+    async def run(self, batches: Iterable[List[Any]], handler: Callable[[Any, Page], Awaitable[Any]],
+                  max_tries=3, delay=1.) -> List[Any]:
+        """
+        Feed items to handler concurrently, one worker per page
+
+        Items in the same batch are handled one after another by the same worker.
+        An item that fails is retried up to max_tries times and then skipped.
+
+        :param batches: iterable of list
+            The batches of items to process
+        :param handler: async function
+            The function to handle an item with a page
+        :param max_tries: int
+            The max number of tries of an item
+        :param delay: float
+            The seconds to wait before retry
+        :return: the items that still fail after max_tries
+        """
+        it = iter(batches)
+        failed: List[Any] = []
+
+        async def _worker(page: Page):
+            generation = self._generation
+            for batch in it:
+                for item in batch:
+                    for i in range(max_tries):
+                        try:
+                            await handler(item, page)
+                            break
+                        except Exception:
+                            logger.exception(f'fail to handle item, try {i + 1}/{max_tries}')
+                            page, generation = await self._recycle(page, generation)
+                            if i + 1 < max_tries:
+                                await asyncio.sleep(delay)
+                    else:
+                        failed.append(item)
+
+        pages = await self.open_pages()
+        await run_workers(pages, [None] * len(pages), lambda _, page: _worker(page))
+        if failed:
+            logger.warning(f'{len(failed)} items failed after {max_tries} tries')
+        return failed
+
+    def stats(self) -> Dict[str, int]:
+        return {'recycled_pages': self.recycled_pages, 'relaunches': self.relaunches}
+
+    async def _launch(self):
+        self._context = await self._launcher(self._pw)  # type: ignore
+        self._generation += 1
+        self._context_closed = False
+
+        def _on_close(_):
+            self._context_closed = True
+        self._context.on('close', _on_close)
+        self._context.on('page', self._watch_page)
+        for page in self._context.pages:
+            self._watch_page(page)
+
+    def _watch_page(self, page: Page):
+        page.on('crash', lambda p: self._crashed.add(p))
+
+    async def _recycle(self, page: Page, generation: int):
+        """
+        Replace the page if it is crashed or closed, relaunch the context if it is closed
+        """
+        async with self._lock:
+            if self._context_closed and generation == self._generation:
+                logger.warning('browser context is closed, relaunch it')
+                self.relaunches += 1
+                await self._launch()
+            if generation != self._generation:
+                # the context has been relaunched by this or another worker
+                self.recycled_pages += 1
+                return await self._context.new_page(), self._generation  # type: ignore
+            if page in self._crashed or page.is_closed():
+                self._crashed.discard(page)
+                logger.warning('page is crashed, open a new one')
+                try:
+                    await page.close()
+                except PlaywrightError:
+                    pass
+                self.recycled_pages += 1
+                return await self._context.new_page(), self._generation  # type: ignore
+            return page, generation
+
+
+class BlockPolicy:
+    """
+    Policy to abort requests of a browser context that are not needed to scrape text
+
+    :param resource_types: list of str
+        The resource types to block, e.g. image, media, font, stylesheet
+    :param domains: list of str
+        The domains to block, sub domains are blocked as well
+    :param max_size: int
+        Responses of sub resources larger than this in bytes are blocked, 0 means no limit.
+        The response has to be fetched to know its size, so it saves browser work but not bandwidth.
+    """
+
+    def __init__(self, resource_types=DEFAULT_BLOCKED_TYPES, domains=DEFAULT_BLOCKED_DOMAINS, max_size=0):
+        self._resource_types = set(resource_types)
+        self._domains = tuple(d.lower() for d in domains)
+        self._max_size = max_size
+        self.blocked: Counter = Counter()
+        self.blocked_bytes = 0
+
+    def get_block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        if resource_type in self._resource_types:
+            return resource_type
+        host = urlparse(url).hostname or ''
+        for domain in self._domains:
+            if host == domain or host.endswith('.' + domain):
+                return 'domain'
+        return None
+
+    async def handle(self, route: Route):
+        request = route.request
+        reason = self.get_block_reason(request.resource_type, request.url)
+        if reason is not None:
+            self.blocked[reason] += 1
+            await route.abort()
+            return
+        if self._max_size <= 0 or request.resource_type == 'document':
+            await route.continue_()
+            return
+        response = await route.fetch()
+        size = int(response.headers.get('content-length') or 0) or len(await response.body())
+        if size > self._max_size:
+            self.blocked['size'] += 1
+            self.blocked_bytes += size
+            await route.abort()
+            return
+        await route.fulfill(response=response)
+
+    async def apply(self, context: BrowserContext):
+        if self._resource_types or self._domains or self._max_size > 0:
+            await context.route('**/*', self.handle)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.blocked, 'blocked_bytes': self.blocked_bytes}
+
+
+# overrides of the saved config when launching browser,
+# all profiles share the same user_data_dir so the cookies set up interactively are reused in batch
+LAUNCH_PROFILES: Dict[str, Dict[str, Any]] = {
+    # setup the browser by hand, e.g. login
+    'interactive': {
+        'headless': False,
+    },
+    # run tasks unattended as fast as possible
+    'batch': {
+        'headless': True,
+        'slow_mo': 0,
+        'args': [
+            '--disable-gpu',
+            '--disable-dev-shm-usage',
+            '--disable-background-timer-throttling',
+            '--disable-backgrounding-occluded-windows',
+            '--disable-renderer-backgrounding',
+            '--disable-features=Translate,MediaRouter,OptimizationHints',
+            '--mute-audio',
+            '--no-first-run',
+            '--no-default-browser-check',
+        ],
+    },
+}
+
+
+def launch_browser(browser_dir: str, channel='chrome', block_policy: Optional[BlockPolicy] = None,
+                   profile: Optional[str] = None, **kwargs):
+    """
+    Create a function to launch a persistent browser context with the config in browser_dir
+
+    :param block_policy: BlockPolicy
+        The policy to block requests of the context, default to block images, media, fonts and trackers
+    :param profile: str
+        The name of launch profile in LAUNCH_PROFILES, the overrides of profile are not saved to config.
+        None to launch with the saved config as is.
+    """
+    assert profile is None or profile in LAUNCH_PROFILES, f"invalid launch profile: {profile}"
+    if block_policy is None:
+        block_policy = BlockPolicy()
     browser_dir = os.path.expanduser(browser_dir)
     config_file = os.path.join(browser_dir, 'config.json')
 
@@ -41,23 +284,211 @@ def launch_browser(browser_dir: str, channel='chrome', **kwargs):
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
 
+    if profile is not None:
+        overrides = LAUNCH_PROFILES[profile]
+        args = config.get('args', []) + [a for a in overrides.get('args', []) if a not in config.get('args', [])]
+        config = {**config, **overrides, 'args': args}
+
     async def _launcher(pw: Playwright):
-        return await pw.chromium.launch_persistent_context(**config)
+        context = await pw.chromium.launch_persistent_context(**config)
+        await block_policy.apply(context)
+        return context
     return _launcher
 
 
+async def open_pages(browser: BrowserContext, n: int) -> List[Page]:
+    """
+    Get n pages from browser context, reuse existing pages and open new ones if needed
+
+    :param browser: BrowserContext
+    :param n: int
+        The number of pages to return
+    """
+    pages = list(browser.pages[:n])
+    while len(pages) < n:
+        pages.append(await browser.new_page())
+    return pages
+
+
+async def run_workers(pages: List[Page], items: Iterable[Any],
+                      handler: Callable[[Any, Page], Awaitable[Any]]):
+    """
+    Feed items to handler concurrently, one worker per page
+
+    Each worker owns a page for its whole lifetime and pulls the next item
+    once the previous one is done, so at most len(pages) items are in flight.
+    The first exception cancels the other workers and is re-raised.
+
+    :param pages: list of Page
+        The pages used by workers
+    :param items: iterable
+        The items to process
+    :param handler: async function
+        The function to handle an item with a page
+    """
+    it = iter(items)
+
+    async def _worker(page: Page):
+        for item in it:
+            await handler(item, page)
+
+    tasks = [asyncio.ensure_future(_worker(page)) for page in pages]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# strategies to decide a page is ready after domcontentloaded
+READY_STRATEGIES = ('domcontentloaded', 'load', 'networkidle', 'dom_quiet')
+
+# titles of challenge pages, e.g. cloudflare, wait until the title changes
+CHALLENGE_TITLES = ('just a moment', 'attention required', 'please wait')
+
+_DOM_QUIET_JS = '''([quietMs, timeoutMs]) => new Promise(resolve => {
+    let timer;
+    const done = () => { observer.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(); };
+    const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, quietMs); });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    timer = setTimeout(done, quietMs);
+    const cap = setTimeout(done, timeoutMs);
+})'''
+
+
+def get_ready_strategy(url: str, default: str, domain_strategies: Optional[Dict[str, str]] = None) -> str:
+    """
+    Get the ready strategy of url, the first domain in domain_strategies that url's host ends with wins
+    """
+    host = urlparse(url).netloc.lower()
+    for domain, strategy in (domain_strategies or {}).items():
+        if host == domain or host.endswith('.' + domain):
+            return strategy
+    return default
+
+
+async def wait_ready(page: Page, strategy='dom_quiet', timeout=5., quiet=0.3) -> bool:
+    """
+    Wait for a page to be ready after it is loaded to domcontentloaded
+
+    :param strategy: str
+        One of READY_STRATEGIES,
+        'networkidle' waits for no network connections for 500ms,
+        'dom_quiet' waits for no DOM mutations for quiet seconds
+    :param timeout: float
+        The max seconds to wait, the page is used as is after timeout
+    :return: False if timeout
+    """
+    assert strategy in READY_STRATEGIES, f'invalid ready strategy: {strategy}'
+    try:
+        if strategy == 'dom_quiet':
+            await page.evaluate(_DOM_QUIET_JS, [quiet * 1e3, timeout * 1e3])
+        elif strategy != 'domcontentloaded':
+            await page.wait_for_load_state(strategy, timeout=timeout * 1e3)  # type: ignore
+    except PlaywrightError:
+        # timeout or the page navigates away, e.g. a redirect by javascript
+        return False
+    return True
+
+
+async def wait_challenge(page: Page, timeout=15.) -> Optional[bool]:
+    """
+    Wait for the title of a challenge page to change
+
+    :return: None if it is not a challenge page, otherwise whether the challenge is passed
+    """
+    title = (await page.title()).lower()
+    if not any(t in title for t in CHALLENGE_TITLES):
+        return None
+    try:
+        await page.wait_for_function(
+            '(titles) => !titles.some(t => document.title.toLowerCase().includes(t))',
+            arg=list(CHALLENGE_TITLES), timeout=timeout * 1e3)
+    except PlaywrightError:
+        return False
+    return True
+
+
+class ReadyStats:
+    """
+    Time of pages to be ready, grouped by ready strategy
+    """
+
+    def __init__(self):
+        self._times: Dict[str, List[float]] = {}
+        self.timeouts = 0
+
+    def add(self, strategy: str, seconds: float, ready=True):
+        self._times.setdefault(strategy, []).append(seconds)
+        if not ready:
+            self.timeouts += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for strategy, times in self._times.items():
+            times = sorted(times)
+            result[strategy] = {
+                'pages': len(times),
+                'mean': round(sum(times) / len(times), 2),
+                'p50': round(times[len(times) // 2], 2),
+                'p90': round(times[min(len(times) - 1, int(len(times) * 0.9))], 2),
+            }
+        return result
+
+
 class BrowserCmd:
 
     def __init__(self):
         pass
 
     def launch(self, browser_dir: str, **kwargs):
+        # nothing is blocked when setup the browser by hand, e.g. login
+        no_block = BlockPolicy(resource_types=(), domains=())
         async def run():
-            async with self._launch_async(browser_dir, **kwargs):
+            async with self._launch_async(browser_dir, block_policy=no_block, profile='interactive', **kwargs):
                 input('Press any key to exit ...')
         asyncio.run(run())
 
+    def benchmark(self, browser_dir: str, url='https://example.com/', rounds=5, profiles=('interactive', 'batch')):
+        """
+        Compare the time of the same browser actions with launch profiles
+
+        :param browser_dir: str
+            The browser directory created by launch
+        :param url: str
+            The page to load in each round
+        :param rounds: int
+            The number of rounds, each round loads the page and reads its title, links and content
+        :param profiles: list of str
+            The launch profiles to compare
+        """
+        async def run(profile: str):
+            async with self._launch_async(browser_dir, profile=profile) as browser:
+                page = browser.pages[0] if browser.pages else await browser.new_page()
+                start = time.monotonic()
+                for _ in range(rounds):
+                    await page.goto(url, wait_until='domcontentloaded')
+                    await page.title()
+                    for link in (await page.locator('a').all())[:5]:
+                        await link.get_attribute('href')
+                    await page.content()
+                return time.monotonic() - start
+
+        results = {}
+        for profile in profiles:
+            # profiles share the user data dir, so they are run one after another
+            elapsed = asyncio.run(run(profile))
+            results[profile] = elapsed
+            print('{}: {:.2f}s total, {:.2f}s per round'.format(profile, elapsed, elapsed / rounds))
+        return results
+
     @asynccontextmanager
-    async def _launch_async(self, browser_dir: str, **kwargs):
+    async def _launch_async(self, browser_dir: str, block_policy: Optional[BlockPolicy] = None, **kwargs):
+        if block_policy is None:
+            block_policy = BlockPolicy()
         async with async_playwright() as pw:
-            yield await launch_browser(browser_dir, **kwargs)(pw)
+            try:
+                yield await launch_browser(browser_dir, block_policy=block_policy, **kwargs)(pw)
+            finally:
+                print('blocked requests: {}'.format(block_policy.stats()))
@@ -0,0 +1,147 @@
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import hashlib
+import json
+import os
+
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+
+def hash_key(*parts: Any) -> str:
+    """
+    Build a cache key from parts with sha256
+    """
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+
+    def __init__(self, cache_dir: str, max_size=1024 * 1024 * 1024):
+        """
+        Content addressed cache of json entries on disk
+
+        Entries are stored as <cache_dir>/<key[:2]>/<key>.json,
+        the mtime of an entry is updated on read so that the least recently used
+        entries are evicted first when the total size exceeds max_size.
+
+        :param cache_dir: str
+            The directory to store entries
+        :param max_size: int
+            The max total size in bytes of entries
+        """
+        self._cache_dir = os.path.expanduser(cache_dir)
+        self._max_size = max_size
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key: str, is_fresh: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get an entry, return None if it is not found or expired
+
+        :param is_fresh: function that accept an entry and return False if it is expired,
+            an expired entry is counted as a miss and also as stale
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        if is_fresh is not None and not is_fresh(entry):
+            self.misses += 1
+            self.stale += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        # the size is scanned before the entry is replaced, so that the entry is counted once
+        size = self.size()
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        self._size = size + os.path.getsize(path) - old_size
+        if self._size > self._max_size:
+            self.evict()
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            os.remove(path)
+            if self._size is not None:
+                self._size -= size
+
+    def size(self) -> int:
+        if self._size is None:
+            self._size = sum(st.st_size for _, st in self._scan())
+        return self._size
+
+    def evict(self, max_size: Optional[int] = None):
+        """
+        Remove least recently used entries until the total size is under 90% of max_size
+        """
+        if max_size is None:
+            max_size = self._max_size
+        entries = sorted(self._scan(), key=lambda e: e[1].st_mtime)
+        size = sum(st.st_size for _, st in entries)
+        target = int(max_size * 0.9)
+        removed = 0
+        for path, st in entries:
+            if size <= target:
+                break
+            os.remove(path)
+            size -= st.st_size
+            removed += 1
+        self._size = size
+        if removed:
+            logger.info('evict %d entries from %s', removed, self._cache_dir)
+        return removed
+
+    def prune(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Remove entries that predicate returns True
+
+        :param predicate: function that accept an entry and return True to remove it
+        :return: the number of removed entries
+        """
+        removed = 0
+        for path, _ in list(self._scan()):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except json.JSONDecodeError:
+                entry = None
+            if entry is None or predicate(entry):
+                os.remove(path)
+                removed += 1
+        self._size = None
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale}
+
+    def _path(self, key: str):
+        return os.path.join(self._cache_dir, key[:2], key + '.json')
+
+    def _scan(self) -> Iterator[Tuple[str, os.stat_result]]:
+        if not os.path.isdir(self._cache_dir):
+            return
+        for sub in os.scandir(self._cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.json'):
+                    yield entry.path, entry.stat()
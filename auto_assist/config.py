@@ -1,19 +1,37 @@
 from .lib import USER_HOME
 
+import copy
 import json
 import os
 
 config_file = os.path.join(USER_HOME, '.auto_assist.json')
 missing = object()
 
+# config_file -> ((mtime_ns, size), config), reloaded when the file changes
+_cache = {}
+
+def _load_cached(config_file=config_file):
+    try:
+        st = os.stat(config_file)
+    except FileNotFoundError:
+        _cache.pop(config_file, None)
+        return {}
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _cache.get(config_file)
+    if cached is None or cached[0] != version:
+        with open(config_file) as f:
+            cached = (version, json.load(f))
+        _cache[config_file] = cached
+    return cached[1]
+
 def load(config_file=config_file):
     """
     Load the config from file
+
+    The parsed config is cached in memory until the file is modified,
+    a copy is returned so that the cache is not changed by callers.
     """
-    if not os.path.exists(config_file):
-        return {}
-    with open(config_file) as f:
-        return json.load(f)
+    return copy.deepcopy(_load_cached(config_file=config_file))
 
 def save(config, config_file=config_file):
     """
@@ -31,16 +49,18 @@ def set(key, value=None, config_file=config_file):
         del config[key]
     else:
         config[key] = value
-    save(config)
+    save(config, config_file=config_file)
 
 def get(key, default=missing, config_file=config_file):
     """
     Get a config value
     """
     if default is missing:
-        return load(config_file=config_file)[key]
+        value = _load_cached(config_file=config_file)[key]
     else:
-        return load(config_file=config_file).get(key, default)
+        value = _load_cached(config_file=config_file).get(key, default)
+    # a mutable value is copied so that the cache is not changed by callers
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
 
 
 class ConfigCmd:
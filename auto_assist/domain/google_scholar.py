@@ -1,18 +1,19 @@
-from playwright.async_api import BrowserContext, TimeoutError
-from bs4 import BeautifulSoup
+from playwright.async_api import BrowserContext, Page, TimeoutError
 
-from typing import List, TypedDict, Tuple, Dict
+from typing import List, TypedDict, Dict
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
+from collections import deque
 
 import asyncio
-import json
 import sys
 import os
 
 
 from auto_assist.lib import get_logger, pending
-from auto_assist.browser import BrowserCmd
+from auto_assist.browser import BrowserCmd, open_pages, run_workers
+from auto_assist.store import JsonlStore
+from auto_assist.jsonl import iter_jsonl, JsonlWriter
 
 logger = get_logger(__name__)
 
@@ -59,7 +60,14 @@ async def gs_explore_profiles(browser: BrowserContext,
                               depth_limit = 1,
                               google_scholar_url='https://scholar.google.com/',
                               order_by_year=True,
+                              concurrency=1,
                               ):
+    """
+    explore google scholar profiles and their co-authors in breadth first order
+
+    :param concurrency: int
+        The number of pages to crawl profiles at the same time
+    """
 
     gs_pdf_dir = os.path.join(out_dir, 'gs_pdfs')
     gs_html_dir = os.path.join(out_dir, 'gs_htmls')
@@ -69,81 +77,132 @@ async def gs_explore_profiles(browser: BrowserContext,
 
     gs_profiles_file = os.path.join(out_dir, 'gs_profiles.jsonl')
 
-    # load existed data
-    gs_profile_map: Dict[str, GsProfileItem] = {}
-    if os.path.exists(gs_profiles_file):
-        profile_list: List[GsProfileItem] = load_jsonl(gs_profiles_file)
-        gs_profile_map = { gs_get_profile_id(profile['url']): profile for profile in profile_list }
+    # existed data are looked up by profile id without loading the whole file
+    gs_profile_map = JsonlStore(gs_profiles_file, key_fn=lambda profile: gs_get_profile_id(profile['url']))
 
-    queue: List[Tuple[str, int]] = [ (url, 0) for url in gs_profile_urls ]
+    # the lowest level each profile has been queued at,
+    # a profile is queued again only if it is reached from a lower level
+    seen: Dict[str, int] = {}
+    # profiles being scraped, they are not queued again
+    scraping = set()
+    frontier: deque = deque()
+    in_flight = 0
+    wakeup = asyncio.Event()
 
-    gs_page = browser.pages[0]
-    while len(queue) > 0:
-        user_url, level = queue.pop(0)
+    def enqueue(url: str, level: int):
         if level > depth_limit:
-            break
-        uid = gs_get_profile_id(user_url)
-        if uid in gs_profile_map:
-            logger.info("profile %s has been processed", user_url)
-            co_authors = gs_profile_map[uid]['co_authors']
-            queue.extend((author['url'], level+1) for author in co_authors)
-            continue
-
-        logger.info("process profile %s, level %d", user_url, level)
-
-        open_url = urljoin(google_scholar_url, user_url)
-        if order_by_year:
-            open_url += '&view_op=list_works&sortby=pubdate'
-        await gs_page.goto(open_url)
-
-        profile = GsProfileItem()  # type: ignore
-        profile['url'] = user_url
-        profile['name'] = await gs_page.locator('div#gsc_prf_in').inner_text()
-        profile['brief'] = await gs_page.locator('div#gsc_prf_w').inner_text()
-        profile['cited_stats'] = await gs_page.locator('table#gsc_rsb_st').inner_text()
-        try:
-            profile['homepage'] = await gs_page.locator('a.gsc_prf_ila').get_by_text("Homepage").get_attribute('href', timeout=1e3)  # type: ignore
-        except TimeoutError:
-            profile['homepage'] = ''
-
-        co_authors = []
-        co_author_links = await gs_page.locator('ul.gsc_rsb_a li a').all()
-        for co_author_link in co_author_links:
-            name = await co_author_link.inner_text()
-            url = await co_author_link.get_attribute('href')
-            co_authors.append(GsProfileEntry(name=name, url=url)) # type: ignore
-            queue.append((url, level+1))  # type: ignore
-
-        articles = []
-        article_links = await gs_page.locator('a.gsc_a_at').all()
-        for article_link in article_links:
-            articles.append(await article_link.inner_text())
-        profile['articles'] = articles
-
-        tags = []
-        tag_links = await gs_page.locator('a.gsc_prf_inta.gs_ibl').all()
-        for tag_link in tag_links:
-            tags.append(await tag_link.inner_text())
-        profile['tags'] = tags
-
-        profile['co_authors'] = co_authors
-        # save pdf
-        pdf_path = os.path.join(gs_pdf_dir, f'profile_{uid}.pdf')
-        await gs_page.pdf(path=pdf_path)
-        profile['pdf_path'] = pdf_path
-        # save html
-        html_path = os.path.join(gs_html_dir, f'profile_{uid}.html')
-        html_text = await gs_page.content()
-        with open(html_path, 'w', encoding='utf-8') as fp:
-            fp.write(html_text)
-        profile['html_path'] = html_path
-        # add to map to avoid duplicate processing
-        gs_profile_map[uid] = profile
-
-        # write result to file
-        with open(gs_profiles_file, 'a', encoding='utf-8') as fp:
-            fp.write(json.dumps(profile, ensure_ascii=False))
-            fp.write('\n')
+            return
+        uid = gs_get_profile_id(url)
+        if uid in seen and seen[uid] <= level:
+            return
+        seen[uid] = level
+        if uid in scraping:
+            return  # its co-authors are queued from the lower level when it is done
+        frontier.append((url, level))
+        wakeup.set()
+
+    async def next_profile():
+        nonlocal in_flight
+        while True:
+            if frontier:
+                in_flight += 1
+                return frontier.popleft()
+            if in_flight == 0:
+                return None
+            wakeup.clear()
+            await wakeup.wait()
+
+    async def worker(gs_page: Page):
+        nonlocal in_flight
+        while True:
+            item = await next_profile()
+            if item is None:
+                wakeup.set()  # let other workers see that the frontier is drained
+                return
+            user_url, level = item
+            try:
+                uid = gs_get_profile_id(user_url)
+                if seen[uid] < level:
+                    continue  # queued again from a lower level
+                if uid in gs_profile_map:
+                    logger.info("profile %s has been processed", user_url)
+                else:
+                    logger.info("process profile %s, level %d", user_url, level)
+                    open_url = urljoin(google_scholar_url, user_url)
+                    if order_by_year:
+                        open_url += '&view_op=list_works&sortby=pubdate'
+                    scraping.add(uid)
+                    try:
+                        profile = await gs_scrape_profile(gs_page, open_url, user_url, uid, gs_pdf_dir, gs_html_dir)
+                    finally:
+                        scraping.discard(uid)
+                    # add to store to avoid duplicate processing, it is written to file in batch
+                    gs_profile_map.add(profile)  # type: ignore
+                # the profile may be reached from a lower level while it is scraped
+                for author in gs_profile_map.get(uid)['co_authors']:  # type: ignore
+                    enqueue(author['url'], seen[uid] + 1)
+            finally:
+                in_flight -= 1
+                wakeup.set()
+
+    for url in gs_profile_urls:
+        enqueue(url, 0)
+
+    try:
+        pages = await open_pages(browser, max(1, concurrency))
+        await run_workers(pages, [None] * len(pages), lambda _, page: worker(page))
+    finally:
+        gs_profile_map.close()
+
+
+async def gs_scrape_profile(gs_page: Page, open_url: str, user_url: str, uid: str,
+                            gs_pdf_dir: str, gs_html_dir: str) -> GsProfileItem:
+    """
+    scrape a google scholar profile page, the pdf and html of the page are saved as well
+    """
+    await gs_page.goto(open_url)
+
+    profile = GsProfileItem()  # type: ignore
+    profile['url'] = user_url
+    profile['name'] = await gs_page.locator('div#gsc_prf_in').inner_text()
+    profile['brief'] = await gs_page.locator('div#gsc_prf_w').inner_text()
+    profile['cited_stats'] = await gs_page.locator('table#gsc_rsb_st').inner_text()
+    try:
+        profile['homepage'] = await gs_page.locator('a.gsc_prf_ila').get_by_text("Homepage").get_attribute('href', timeout=1e3)  # type: ignore
+    except TimeoutError:
+        profile['homepage'] = ''
+
+    co_authors = []
+    co_author_links = await gs_page.locator('ul.gsc_rsb_a li a').all()
+    for co_author_link in co_author_links:
+        name = await co_author_link.inner_text()
+        url = await co_author_link.get_attribute('href')
+        co_authors.append(GsProfileEntry(name=name, url=url)) # type: ignore
+
+    articles = []
+    article_links = await gs_page.locator('a.gsc_a_at').all()
+    for article_link in article_links:
+        articles.append(await article_link.inner_text())
+    profile['articles'] = articles
+
+    tags = []
+    tag_links = await gs_page.locator('a.gsc_prf_inta.gs_ibl').all()
+    for tag_link in tag_links:
+        tags.append(await tag_link.inner_text())
+    profile['tags'] = tags
+
+    profile['co_authors'] = co_authors
+    # save pdf
+    pdf_path = os.path.join(gs_pdf_dir, f'profile_{uid}.pdf')
+    await gs_page.pdf(path=pdf_path)
+    profile['pdf_path'] = pdf_path
+    # save html
+    html_path = os.path.join(gs_html_dir, f'profile_{uid}.html')
+    html_text = await gs_page.content()
+    with open(html_path, 'w', encoding='utf-8') as fp:
+        fp.write(html_text)
+    profile['html_path'] = html_path
+    return profile
 
 
 async def gs_search_by_authors(browser: BrowserContext,
@@ -159,13 +218,18 @@ async def gs_search_by_authors(browser: BrowserContext,
     os.makedirs(out_dir, exist_ok=True)
     gs_result_file = os.path.join(out_dir, 'gs_result.jsonl')
 
-    # load existed results
-    gs_search_result = []
-    if os.path.exists(gs_result_file):
-        gs_search_result: List[GsSearchItem] = load_jsonl(gs_result_file)
+    # existed results are looked up by article url without loading the whole file
+    with JsonlStore(gs_result_file, key_fn=lambda item: item['url']) as processed_articles:
+        await _gs_search_by_authors(browser, authors, processed_articles, page_limit, keyword, google_scholar_url)
 
-    processed_articles = set(item['url'] for item in gs_search_result)
 
+async def _gs_search_by_authors(browser: BrowserContext,
+                                authors: List[str],
+                                processed_articles: JsonlStore,
+                                page_limit: int,
+                                keyword: str,
+                                google_scholar_url: str,
+                                ):
     gs_page = browser.pages[0]
     for author in authors:
         # search articles by auther
@@ -226,30 +290,22 @@ async def gs_search_by_authors(browser: BrowserContext,
                         citation=citation,
                         profiles=gs_profiles,
                     )
-                    gs_search_result.append(gs_search_item)
-
-                    # write result to file
-                    with open(gs_result_file, 'a', encoding='utf-8') as fp:
-                        fp.write(json.dumps(gs_search_item, ensure_ascii=False))
-                        fp.write('\n')
-
-                    processed_articles.add(article_url)  # type: ignore
+                    # written to file in batch
+                    processed_articles.add(gs_search_item)  # type: ignore
 
                 except TimeoutError as e:
                     logger.exception("unexpected error occured")
 
 
 def gs_list_profile_urls(result_file: str):
-    result: List[GsSearchItem] = load_jsonl(result_file)
-    urls = set(profile['url'] for item in result for profile in item['profiles'])
+    urls = set(profile['url'] for item in iter_jsonl(result_file) for profile in item['profiles'])
     print('\n'.join(urls))
 
 
 def gs_list_authors(result_file: str):
     from colorama import deinit
     deinit()
-    result: List[GsSearchItem] = load_jsonl(result_file)
-    names = set(author for item in result for author in item['citation']['authors'])
+    names = set(author for item in iter_jsonl(result_file) for author in item['citation']['authors'])
     print('\n'.join(names))
 
 
@@ -268,37 +324,34 @@ def gs_fix_profile_from_html(out_dir: str, suffix = None):
     src = os.path.join(out_dir, 'gs_profiles.jsonl')
     dst = os.path.join(out_dir, f'gs_profiles_{suffix}.jsonl')
 
-    profiles: List[GsProfileItem] = load_jsonl(src)
-    for profile in profiles:
-        # fix co_authors name
-        for co_author in profile['co_authors']:
-            if isinstance(co_author['name'], list):
-                co_author['name'] = co_author['name'][0]
-        # fix data from html
-        html_path = os.path.join(gs_html_dir, os.path.basename(profile['html_path']))
-        with open(html_path, 'r', encoding='utf-8') as fp:
-            soup = BeautifulSoup(fp, 'html.parser')
-        # get article from html
-        article_links = soup.select('a.gsc_a_at')
-        articles = [article_div.text for article_div in article_links]
-        profile['articles'] = articles
-        # get tags from html
-        tags_links = soup.select('a.gsc_prf_inta.gs_ibl')
-        tags = [tag_div.text for tag_div in tags_links]
-        profile['tags'] = tags
-
-    with open(dst, 'w', encoding='utf-8') as fp:
-        for profile in profiles:
-            fp.write(json.dumps(profile, ensure_ascii=False))
-            fp.write('\n')
+    with JsonlWriter(dst) as writer:
+        for profile in iter_jsonl(src):
+            writer.write(gs_fix_profile(profile, gs_html_dir))
+
+
+def gs_fix_profile(profile: GsProfileItem, gs_html_dir: str) -> GsProfileItem:
+    from bs4 import BeautifulSoup
+    # fix co_authors name
+    for co_author in profile['co_authors']:
+        if isinstance(co_author['name'], list):
+            co_author['name'] = co_author['name'][0]
+    # fix data from html
+    html_path = os.path.join(gs_html_dir, os.path.basename(profile['html_path']))
+    with open(html_path, 'r', encoding='utf-8') as fp:
+        soup = BeautifulSoup(fp, 'html.parser')
+    # get article from html
+    article_links = soup.select('a.gsc_a_at')
+    articles = [article_div.text for article_div in article_links]
+    profile['articles'] = articles
+    # get tags from html
+    tags_links = soup.select('a.gsc_prf_inta.gs_ibl')
+    tags = [tag_div.text for tag_div in tags_links]
+    profile['tags'] = tags
+    return profile
 
 
 def load_jsonl(file: str):
-    result = []
-    with open(file, 'r', encoding='utf-8') as fp:
-        for line in fp:
-            result.append(json.loads(line))
-    return result
+    return list(iter_jsonl(file))
 
 
 def parse_endnote(text: str):
@@ -350,8 +403,16 @@ def parse_endnote(text: str):
 
 class GsCmd:
 
-    def __init__(self, browser_dir) -> None:
+    def __init__(self, browser_dir, launch_profile='batch') -> None:
+        """
+        :param browser_dir: str
+            The browser directory created by browser launch
+        :param launch_profile: str
+            The launch profile of browser, 'batch' runs headless without slow motion,
+            use 'interactive' to watch the browser or solve captcha by hand
+        """
         self._browser_dir = browser_dir
+        self._launch_profile = launch_profile
 
     def gs_search_by_authors(self,
                              out_dir: str = './out',
@@ -361,7 +422,7 @@ class GsCmd:
                              ):
         authors = [line.strip() for line in sys.stdin]
         async def run():
-            async with BrowserCmd()._launch_async(self._browser_dir) as browser_ctx:
+            async with BrowserCmd()._launch_async(self._browser_dir, profile=self._launch_profile) as browser_ctx:
                 await gs_search_by_authors(
                     browser_ctx, authors=authors, out_dir=out_dir, keyword=keyword, page_limit=page_limit, google_scholar_url=google_scholar_url)
                 pending()
@@ -372,12 +433,14 @@ class GsCmd:
                             depth_limit=1,
                             google_scholar_url='https://scholar.google.com/',
                             order_by_year=True,
+                            concurrency=1,
                             ):
         profile_urls = [line.strip() for line in sys.stdin]
         async def run():
-            async with BrowserCmd()._launch_async(self._browser_dir) as browser_ctx:
+            async with BrowserCmd()._launch_async(self._browser_dir, profile=self._launch_profile) as browser_ctx:
                 await gs_explore_profiles(
                     browser_ctx, gs_profile_urls=profile_urls, out_dir=out_dir, depth_limit=depth_limit, order_by_year=order_by_year, google_scholar_url=google_scholar_url,
+                    concurrency=concurrency,
                 )
                 pending()
         asyncio.run(run())
@@ -1,10 +1,12 @@
 from playwright.async_api import async_playwright, Page
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
+from urllib.parse import urlparse
 
-import pandas as pd
 import subprocess as sp
-import requests
+import functools
+import io
 import asyncio
 import random
 import json
@@ -13,41 +15,192 @@ import os
 
 from auto_assist.lib import (
     url_to_key, get_md_code_block, excel_autowidth,
-    expand_globs, get_logger, clean_html, formal_filename,
-    jsonl_load, jsonl_dump, jsonl_loads,
+    expand_globs, get_logger, clean_html, clean_soup, formal_filename,
+    jsonl_dump, jsonl_loads,
     json_load_file, json_dump_file,
-    is_chinese_name,
+    is_chinese_names, group_by_key,
+    is_up_to_date, run_file_jobs, clean_html_file, write_text_atomic,
     )
-from auto_assist.browser import launch_browser
+from auto_assist.browser import (
+    launch_browser, BrowserPool,
+    wait_ready, wait_challenge, get_ready_strategy, ReadyStats,
+    BlockPolicy, DEFAULT_BLOCKED_TYPES,
+    )
+from auto_assist.scheduler import HostScheduler, OK, THROTTLED, CHALLENGE
+from auto_assist.llm import LlmRunner, get_openai_client, prompt_sha, split_markdown, estimate_tokens
+from auto_assist.mdprune import prune_markdown, restore_urls
+from auto_assist.state import JobStore, STAGES
+from auto_assist.jsonl import iter_jsonl, JsonlWriter
+from auto_assist.cache import DiskCache, hash_key
+from auto_assist.pipeline import Pipeline
+from auto_assist.fetch import HttpFetcher, parse_retry_after
+from auto_assist.pagecache import PageCache, normalize_query
 from auto_assist import config
 
 from . import prompt
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = get_logger(__name__)
 
+# the job store file in the output directory of search commands
+JOB_STORE_FILE = 'jobs.sqlite'
+
+GOOGLE_URL = 'https://www.google.com/ncr'
+
+# domains that need a different ready strategy from the default
+DOMAIN_READY = {
+    'linkedin.com': 'networkidle',
+}
+GOOGLE_RESULT_SELECTOR = 'div#search div.g[jscontroller][jsaction]'
+
+# kind of markdown file -> (prompt, suffix of output file)
+EXTRACT_TASKS = {
+    'faculty': (prompt.RETRIVE_FACULTY_MEMBERS, '.jsonl'),
+    'cv': (prompt.RETRIEVE_SCHOLAR_OBJECT, '.json'),
+    'group': (prompt.RETRIVE_GROUP_MEMBERS, '.jsonl'),
+}
+
 class HunterCmd:
 
     def __init__(self,
+                 converter='pandoc',
+                 html_parser='html.parser',
                  pandoc_cmd='pandoc',
                  pandoc_opt='+RTS -M1024m -RTS --sandbox -f html-native_divs-native_spans -t markdown',
                  openai_log='./openai-log.jsonl',
                  browser_dir=None,
-                 proxy=None):
+                 proxy=None,
+                 max_per_domain=1,
+                 domain_interval=0.,
+                 llm_concurrency=4,
+                 llm_max_retries=5,
+                 llm_cache_dir='./llm-cache',
+                 llm_cache_max_mb=1024,
+                 chunk_tokens=6000,
+                 prune_md=True,
+                 max_job_errors=3,
+                 http_fetch=True,
+                 http_max_per_host=4,
+                 page_cache_dir='./page-cache',
+                 page_cache_ttl_days=7.,
+                 search_cache_dir='./search-cache',
+                 search_cache_ttl_days=30.,
+                 ready_strategy='dom_quiet',
+                 ready_timeout=5.,
+                 domain_ready=None,
+                 block_max_kb=0,
+                 launch_profile='batch',
+                 cpu_workers=2,
+                 extract_concurrency=None,
+                 queue_size=16):
         """
         Camnnd line interface to the Chemistry Hunter
 
+        :param converter: str
+            The backend to convert html to markdown, 'pandoc' or 'python'.
+            'python' converts in process without starting a pandoc process per page.
+        :param html_parser: str
+            The parser to clean html, 'html.parser' or 'lxml'. 'lxml' is much faster but requires lxml installed.
         :param pandoc_cmd: str
             The command to run pandoc
         :param proxy: str
             The proxy to use for requests and playwright
+        :param max_per_domain: int
+            The max number of pages to load from the same domain at the same time
+        :param domain_interval: float
+            The min interval in seconds between two page loads from the same domain,
+            0 means no limit until the domain throttles us, then requests are paced adaptively
+        :param llm_concurrency: int
+            The max number of LLM requests in flight
+        :param llm_max_retries: int
+            The max number of retries of a LLM request on rate limit or transient errors
+        :param llm_cache_dir: str
+            The directory to cache LLM responses, set to empty to disable cache
+        :param llm_cache_max_mb: int
+            The max size in MB of LLM cache, least recently used entries are evicted first
+        :param chunk_tokens: int
+            The max estimated tokens of a markdown chunk sent to LLM,
+            large faculty and group pages are split into chunks and extracted concurrently
+        :param prune_md: bool
+            Whether to remove navigation, footer and long urls from markdown before sending it to LLM
+        :param max_job_errors: int
+            Pages that failed this many times are skipped on restart
+        :param http_fetch: bool
+            Whether to fetch pages with http client first,
+            pages that require javascript or are protected by cloudflare are loaded by browser
+        :param http_max_per_host: int
+            The max number of http connections to the same host
+        :param page_cache_dir: str
+            The directory to cache raw pages shared by all output directories, set to empty to disable cache
+        :param page_cache_ttl_days: float
+            The days that a cached page is used without revalidation
+        :param search_cache_dir: str
+            The directory to cache google search results shared by all commands, set to empty to disable cache
+        :param search_cache_ttl_days: float
+            The days that a cached search result is used
+        :param ready_strategy: str
+            How to decide a page loaded by browser is ready, one of
+            'domcontentloaded', 'load', 'networkidle' and 'dom_quiet' (no DOM mutations for 300ms)
+        :param ready_timeout: float
+            The max seconds to wait for a page to be ready
+        :param domain_ready: dict
+            The ready strategy of domains, e.g. {"linkedin.com": "networkidle"}
+        :param block_max_kb: int
+            Block sub resources larger than this in KB when loading pages by browser, 0 means no limit.
+            Images, media, fonts, stylesheets and trackers are always blocked.
+        :param launch_profile: str
+            The launch profile of browser, 'batch' runs headless without slow motion,
+            use 'interactive' to watch the browser or solve captcha by hand
+        :param cpu_workers: int
+            The number of processes to clean and convert scraped pages,
+            pages are scraped, converted and parsed at the same time in a pipeline
+        :param extract_concurrency: int
+            The number of pages parsed by LLM at the same time, default to llm_concurrency
+        :param queue_size: int
+            The max number of pages waiting for each stage of the pipeline
         """
+        assert converter in ('pandoc', 'python'), f'invalid converter: {converter}'
+        self._converter = converter
+        self._html_parser = html_parser
         self._pancdo_cmd = pandoc_cmd
         self._pandoc_opt = pandoc_opt
         self._proxy = proxy
         self._browser_dir = browser_dir
         self._openai_log = openai_log
-
-    def search_faculties(self, in_excel, out_dir, parse=False, max_tries=3, delay=1):
+        self._max_per_domain = max_per_domain
+        self._domain_interval = domain_interval
+        self._scheduler = self._new_scheduler()
+        self._ready_strategy = ready_strategy
+        self._ready_timeout = ready_timeout
+        self._domain_ready = {**DOMAIN_READY, **(domain_ready or {})}
+        self._ready_stats = ReadyStats()
+        self._block_max_size = block_max_kb * 1024
+        self._launch_profile = launch_profile
+        self._cpu_workers = cpu_workers
+        self._extract_concurrency = extract_concurrency
+        self._queue_size = queue_size
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._pipeline: Optional[Pipeline] = None
+        self._llm_concurrency = llm_concurrency
+        self._llm_max_retries = llm_max_retries
+        self._llm: Optional[LlmRunner] = None
+        self._chunk_tokens = chunk_tokens
+        self._prune_md = prune_md
+        self._max_job_errors = max_job_errors
+        self._job_stores: Dict[str, JobStore] = {}
+        self._http_fetch = http_fetch
+        self._http_max_per_host = http_max_per_host
+        self._fetcher: Optional[HttpFetcher] = None
+        self._page_cache = PageCache(page_cache_dir, ttl=page_cache_ttl_days * 24 * 3600) if page_cache_dir else None
+        self._search_cache = DiskCache(search_cache_dir) if search_cache_dir else None
+        self._search_cache_ttl = search_cache_ttl_days * 24 * 3600
+        # searches in flight, the same query from other workers waits for it instead of searching again
+        self._pending_searches: Dict[str, asyncio.Task] = {}
+        self._llm_cache = DiskCache(llm_cache_dir, max_size=llm_cache_max_mb * 1024 * 1024) if llm_cache_dir else None
+
+    def search_faculties(self, in_excel, out_dir, parse=False, max_tries=3, delay=1, concurrency=1):
         """
         Search faculty members from excel file
 
@@ -57,27 +210,22 @@ class HunterCmd:
             The output directory to save the faculty members
         :param parse: bool
             Whether to parse the faculty members
+        :param max_tries: int
+            The max number of tries of a row, the browser is kept between tries
+        :param concurrency: int
+            The number of pages to crawl at the same time
         """
         df = self.load_excel(in_excel)
-        async def _run():
-            async with async_playwright() as pw:
-                # setup browser
-                assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
-                for i, row in df.iterrows():
-                    await self._async_search_faculty(row, out_dir, page, parse=parse)
-        asyncio.run(_run())
+        rows = [row for _, row in df.iterrows()]
 
-        for _ in range(max_tries):
-            try:
-                asyncio.run(_run())
-                logger.info('search faculties done')
-                break
-            except Exception as e:
-                logger.exception(f'fail to search faculties')
-                time.sleep(delay)
+        def _key(row):
+            url = row['FacultyPage']
+            return url_to_key(url, no_ext=True) if isinstance(url, str) and url else None
+
+        asyncio.run(self._async_run_rows(
+            rows, lambda row, page: self._async_search_faculty(row, out_dir, page, parse=parse),
+            key_fn=_key, concurrency=concurrency, max_tries=max_tries, delay=delay))
+        logger.info('search faculties done')
 
     def process_faculties(self, *faculty_dirs, out_excel):
         """
@@ -88,56 +236,19 @@ class HunterCmd:
         :param out_excel: str
             The output excel file to save the candidates
         """
-        candidates = []
-        for faculty_dir in expand_globs(faculty_dirs):
-            index_json_file = os.path.join(faculty_dir, 'index.json')
-            index = json_load_file(index_json_file)
-            faculty_json_file = os.path.join(faculty_dir, 'faculty.html.md.jsonl')
-            with open(faculty_json_file, 'r', encoding='utf-8') as f:
-                faculties = list(jsonl_load(f))
-            base_url = index.get('FacultyPage', '')
-            base_url = base_url.split('?', maxsplit=1)[0]  # remove query string
-            assert isinstance(base_url, str), f'invalid base url: {base_url}'
-            for faculty in faculties:
-                faculty['src'] = index['FacultyPage']
-                faculty['institute'] = index.get('Institute', '')
-                faculty['department'] = index.get('Department', '')
-                profile_url = faculty.get('profile_url', '')
-                if profile_url and not profile_url.startswith('http'):
-                    _base_url = base_url
-                    if profile_url.startswith('/'):
-                        _base_url = base_url[:8] + base_url[8:].split('/', maxsplit=1)[0]
-                    faculty['profile_url'] = _base_url + profile_url
-                title = faculty.get('title', '').lower()
-                if not title:
-                    logger.warning(f'title is empty for {faculty["name"]} in {faculty_json_file}')
-                if ('assist' in title and 'prof' in title) or ('aprof' in title):
-                    candidates.append(faculty)
-
-        df = pd.DataFrame(candidates)
+        df = collect_faculties(expand_globs(faculty_dirs))
         with open(out_excel, 'wb') as f:
             df.to_excel(f, index=False)
 
-    def search_cvs(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False):
+    def search_cvs(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False, concurrency=1):
         df = self.load_excel(in_excel)
-        async def _run():
-            async with async_playwright() as pw:
-                # setup browser
-                assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
-                for i, row in df.iterrows():
-                    await self._async_search_cv(row, out_dir, page,
-                                                max_search=max_search, parse=parse)
-        for _ in range(max_tries):
-            try:
-                asyncio.run(_run())
-                logger.info('search cvs done')
-                break
-            except Exception as e:
-                logger.exception(f'fail to search cvs')
-                time.sleep(delay)
+        rows = [row for _, row in df.iterrows()]
+        asyncio.run(self._async_run_rows(
+            rows, lambda row, page: self._async_search_cv(row, out_dir, page,
+                                                          max_search=max_search, parse=parse),
+            key_fn=lambda row: formal_filename(f'{row["name"]}-{row["institute"]}'),
+            concurrency=concurrency, max_tries=max_tries, delay=delay))
+        logger.info('search cvs done')
 
     def process_cvs(self, *cv_dirs, out_excel):
         """
@@ -148,6 +259,7 @@ class HunterCmd:
         :param out_file: str
             The output file in excel format to save the teams
         """
+        import pandas as pd
         groups = []
 
         for cv_dir in expand_globs(cv_dirs):
@@ -178,42 +290,34 @@ class HunterCmd:
                 df.to_excel(writer, sheet_name='groups', index=False)
                 excel_autowidth(df, writer.sheets['groups'], max_width=150)
 
-    def search_group_members(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False):
+    def search_group_members(self, in_excel, out_dir, max_search=3, max_tries=1, delay=1, parse=False,
+                             concurrency=1):
         """
         Search group members from excel file
 
         :param in_excel: str
             The input excel file that contains advisor and group information
         :param out_dir: str
+        :param concurrency: int
+            The number of pages to crawl at the same time
         """
         df = self.load_excel(in_excel)
-        async def _run():
-            async with async_playwright() as pw:
-                # setup browser
-                assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
-                page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}',
-                                 lambda route: route.abort())
-                # search team members
-                known_advisors = set()
-
-                for i, row in df.iterrows():
-                    advisor = row.get('advisor')
-                    if not isinstance(advisor, str) or not advisor or advisor.lower() in known_advisors:
-                        continue
-                    known_advisors.add(advisor.lower())
-                    await self._async_search_group(row, out_dir, page,
-                                                   max_search=max_search, parse=parse)
+        # search team members
+        known_advisors = set()
+        rows = []
+        for i, row in df.iterrows():
+            advisor = row.get('advisor')
+            if not isinstance(advisor, str) or not advisor or advisor.lower() in known_advisors:
+                continue
+            known_advisors.add(advisor.lower())
+            rows.append(row)
 
-        for _ in range(max_tries):
-            try:
-                asyncio.run(_run())
-                logger.info('search team members done')
-                break
-            except Exception as e:
-                logger.exception(f'fail to search team members')
-                time.sleep(delay)
+        asyncio.run(self._async_run_rows(
+            rows, lambda row, page: self._async_search_group(row, out_dir, page,
+                                                             max_search=max_search, parse=parse),
+            key_fn=lambda row: formal_filename(f'{row["advisor"]}-{row["institute"]}'),
+            concurrency=concurrency, max_tries=max_tries, delay=delay))
+        logger.info('search team members done')
 
     def process_groups(self, *group_dirs, out_excel):
         """
@@ -224,60 +328,8 @@ class HunterCmd:
         :param out_excel: str
             The output excel file to save the group members
         """
-        groups = []
-        candidates = []
-
-        known_names = set()
-        for group_dir in expand_globs(group_dirs):
-            index_json_file = os.path.join(group_dir, 'index.json')
-            group = json_load_file(index_json_file)
-            google_search_file = os.path.join(group_dir, 'google-search.json')
-            google_results = json_load_file(google_search_file)
-            urls = [r['url'] for r in google_results if valid_group_url(r['url'])][:3]
-
-            groups.append({
-                'institute': group.get('institute', ''),
-                'group': group.get('group', ''),
-                'advisor': group.get('advisor', ''),
-                'urls': '\r\n'.join(urls),
-            })
-
-            for group_file in expand_globs([f'{group_dir}\group-*.jsonl']):
-                with open(group_file, 'r', encoding='utf-8') as f:
-                    members = list(jsonl_load(f))
-
-                for member in members:
-                    try:
-                        name = member.get('name', '')
-                        if name.lower() in known_names:
-                            continue
-                        known_names.add(name.lower())
-                        # is chinese name is decided by LLM, double check is required
-                        is_chinese = member.get('is_chinese', False)
-                        if not is_chinese:
-                            # double check if the name is chinese
-                            is_chinese = is_chinese_name(name)
-                        if not is_chinese:
-                            continue
-                        title = member.get('title', '')
-                        # filter out non-graduate students, if title is empty also keep it
-                        if title and not is_graduate(title):
-                            continue
-                        candidates.append({
-                            'name': name,
-                            'title': title,
-                            'email': member.get('email', ''),
-                            'advisor': group.get('advisor', ''),
-                            'group': group.get('group', ''),
-                            'institute': group.get('institute', ''),
-                            'description': member.get('description', ''),
-                        })
-                    except Exception as e:
-                        logger.exception(f'fail to process {group_file}')
-                        logger.info(f'member: {member}')
-
-        group_df = pd.DataFrame(groups)
-        candidate_df = pd.DataFrame(candidates)
+        import pandas as pd
+        group_df, candidate_df = collect_groups(expand_globs(group_dirs))
 
         with pd.ExcelWriter(out_excel, engine_kwargs={'options':{'strings_to_urls': False}}) as writer:
             writer.book.formats[0].set_text_wrap()  # type: ignore
@@ -290,9 +342,8 @@ class HunterCmd:
         async def _run():
             async with async_playwright() as pw:
                 assert isinstance(self._browser_dir, str)
-                browser = await launch_browser(self._browser_dir)(pw)
+                browser = await launch_browser(self._browser_dir, block_policy=self._new_block_policy(), profile=self._launch_profile)(pw)
                 page = browser.pages[0]
-                await page.route('**/*.{png,jpg,jpeg,webp,css,woff,woff2,ttf,svg}', lambda route: route.abort())
                 links = await self._async_google_search(keyword, page)
                 if debug:
                     pprint(links)
@@ -301,6 +352,139 @@ class HunterCmd:
         links = asyncio.run(_run())
         return links
 
+    def parse(self, *out_dirs, concurrency=None, force=False):
+        """
+        Parse markdown files in output directories with LLM
+
+        The kind of a markdown file is decided by its name,
+        faculty.html.md, cv-*.md and group-*.md are supported.
+
+        :param out_dirs: list of str
+            The output directories of search_faculties, search_cvs or search_group_members
+        :param concurrency: int
+            The max number of LLM requests in flight, default to llm_concurrency.
+            The number of files parsed at the same time is extract_concurrency, default to the same value.
+        :param force: bool
+            Whether to parse again if the output file exists
+        """
+        jobs = []
+        for out_dir in expand_globs(out_dirs):
+            for md_file in expand_globs([os.path.join(out_dir, '**', '*.md')]):
+                kind = get_extract_kind(md_file)
+                if kind is None:
+                    continue
+                out_file = md_file + EXTRACT_TASKS[kind][1]
+                # the job store is in the output directory of search command
+                store_dir = os.path.dirname(os.path.dirname(os.path.abspath(md_file)))
+                store = None
+                if os.path.exists(os.path.join(store_dir, JOB_STORE_FILE)):
+                    store = self._get_job_store(store_dir)
+                job = os.path.relpath(md_file[:-len('.md')], store_dir)
+                if force or not (store.is_done(job, 'parsed', out_file) if store else os.path.exists(out_file)):
+                    jobs.append((md_file, out_file, kind, store, job))
+        logger.info(f'{len(jobs)} markdown files to parse')
+
+        async def _parse(md_file, out_file, kind, store: Optional[JobStore], job):
+            ok = await self._async_extract(md_file, out_file, kind)
+            if store is not None:
+                if ok:
+                    store.mark(job, 'parsed')
+                else:
+                    store.fail(job, 'fail to parse')
+
+        async def _worker(pending):
+            for job in pending:
+                await _parse(*job)
+
+        async def _run():
+            self._llm = None
+            if concurrency is not None:
+                self._llm_concurrency = concurrency
+            # a fixed number of workers share the jobs, so that only that many files are parsed at the same time
+            pending = iter(jobs)
+            n_workers = self._extract_concurrency or self._llm_concurrency
+            await asyncio.gather(*[_worker(pending) for _ in range(n_workers)])
+        asyncio.run(_run())
+        self._log_llm_cache_stats()
+
+    def job_status(self, out_dir, show_failed=False):
+        """
+        Show the number of pages at each stage in the job store of out_dir
+
+        :param out_dir: str
+            The output directory of search command
+        :param show_failed: bool
+            Whether to list the pages that failed
+        """
+        store = self._get_job_store(out_dir)
+        jobs = store.jobs()
+        for stage in STAGES:
+            print(f'{stage}: {sum(1 for job in jobs if job.stage == stage)}')
+        failed = [job for job in jobs if job.errors > 0 and job.stage != 'parsed']
+        print(f'failed: {len(failed)}')
+        if show_failed:
+            for job in failed:
+                print(f'{job.key}\t{job.url}\t{job.errors}\t{job.last_error}')
+
+    def prune_llm_cache(self):
+        """
+        Remove cached LLM responses of prompts that no longer exist in prompt module
+        """
+        if self._llm_cache is None:
+            return
+        prompt_shas = set(prompt_sha(p) for _, p in iter_prompts())
+        removed = self._llm_cache.prune(lambda entry: entry.get('prompt_sha') not in prompt_shas)
+        logger.info(f'{removed} entries removed from llm cache')
+
+    def prune_page_cache(self, max_age_days=30):
+        """
+        Remove cached pages fetched more than max_age_days ago
+
+        :param max_age_days: float
+            The max age in days of cached pages to keep
+        """
+        if self._page_cache is None:
+            return
+        removed = self._page_cache.prune(max_age_days * 24 * 3600)
+        logger.info(f'{removed} entries removed from page cache')
+
+    def benchmark_groups(self, members=100_000, group_size=20):
+        """
+        Benchmark filtering group members over a synthetic corpus
+
+        :param members: int
+            The number of members in the corpus
+        :param group_size: int
+            The number of members of a group
+        """
+        pprint(benchmark_collect_groups(members, group_size))
+
+    def prune_md(self, *md_files: str, out_dir=None):
+        """
+        Report the tokens of markdown files before and after pruning
+
+        :param md_files: list of str
+            The markdown files to prune
+        :param out_dir: str
+            The output directory to save pruned markdown files, if None, only report
+        """
+        if out_dir is not None:
+            os.makedirs(out_dir, exist_ok=True)
+        total_before, total_after = 0, 0
+        for md_file in expand_globs(md_files):
+            with open(md_file, 'r', encoding='utf-8') as f:
+                md_content = f.read()
+            pruned, _ = prune_markdown(md_content)
+            before, after = estimate_tokens(md_content), estimate_tokens(pruned)
+            total_before += before
+            total_after += after
+            logger.info(f'{md_file}: {before} -> {after} tokens')
+            if out_dir is not None:
+                with open(os.path.join(out_dir, os.path.basename(md_file)), 'w', encoding='utf-8') as f:
+                    f.write(pruned)
+        logger.info(f'total: {total_before} -> {total_after} tokens, '
+                    f'{1 - total_after / max(total_before, 1):.1%} reduced')
+
     def pandoc_convert(self, in_html, out_md):
         """
         Convert html to markdown
@@ -310,25 +494,50 @@ class HunterCmd:
         :param out_md: str
             The output markdown file
         """
-        return sp.check_call(f'{self._pancdo_cmd} {self._pandoc_opt} "{in_html}" -o "{out_md}"', shell=True)
+        return pandoc_convert(in_html, out_md, pandoc_cmd=self._pancdo_cmd, pandoc_opt=self._pandoc_opt)
+
+    def python_convert(self, in_html, out_md):
+        """
+        Convert html to markdown in process
+
+        :param in_html: str
+            The input html file
+        :param out_md: str
+            The output markdown file
+        """
+        return python_convert(in_html, out_md)
+
+    def convert(self, in_html, out_md):
+        """
+        Convert html to markdown with the selected converter
+        """
+        return self._get_convert_fn()(in_html, out_md)
 
-    def convert_html_to_md(self, *html_files: str, out_dir: str):
+    def convert_html_to_md(self, *html_files: str, out_dir: str, workers=1, force=False):
         """
-        Convert html files to markdown files with pandoc
+        Convert html files to markdown files with the selected converter
 
         :param html_files: list of str
             The html files to convert
         :param out_dir: str
+        :param workers: int
+            The number of processes to convert files
+        :param force: bool
+            Whether to convert files whose output is newer than the input
         """
         in_files = expand_globs(html_files)
         os.makedirs(out_dir, exist_ok=True)
+        jobs = []
         for in_file in in_files:
             filename = os.path.basename(in_file)
             out_file = os.path.join(out_dir, filename + '.md')
-            logger.info(f'converting {in_file} to {out_file}')
-            self.pandoc_convert(in_file, out_file)
+            if not force and is_up_to_date(in_file, out_file):
+                continue
+            jobs.append((in_file, out_file))
+        logger.info(f'converting {len(jobs)} files, {len(in_files) - len(jobs)} files are up to date')
+        run_file_jobs(self._get_convert_fn(), jobs, workers=workers)
 
-    def clean_html(self, *html_files: str, out_dir = None):
+    def clean_html(self, *html_files: str, out_dir = None, workers=1, force=False):
         """
         Clean html files to reduce size
 
@@ -336,20 +545,94 @@ class HunterCmd:
             The html files to clean
         :param out_dir: st
             The output directory, if None, will overwrite the input files
+        :param workers: int
+            The number of processes to clean files
+        :param force: bool
+            Whether to clean files whose output is newer than the input
         """
         if out_dir is not None:
             os.makedirs(out_dir, exist_ok=True)
         in_files = expand_globs(html_files)
+        jobs = []
         for in_file in in_files:
             filename = os.path.basename(in_file)
             out_file = os.path.join(out_dir, filename) if out_dir else in_file
-            logger.info(f'cleaning {in_file} to {out_file}')
-            with open(in_file, 'r+', encoding='utf-8') as f:
-                cleaned = clean_html(f)
-                f.seek(0)
-                f.write(cleaned)
+            if not force and is_up_to_date(in_file, out_file):
+                continue
+            jobs.append((in_file, out_file))
+        logger.info(f'cleaning {len(jobs)} files, {len(in_files) - len(jobs)} files are up to date')
+        run_file_jobs(functools.partial(clean_html_file, parser=self._html_parser), jobs, workers=workers)
+
+    def _get_convert_fn(self):
+        """
+        Get a picklable function to convert html file to markdown file
+        """
+        if self._converter == 'python':
+            return python_convert
+        return functools.partial(pandoc_convert, pandoc_cmd=self._pancdo_cmd, pandoc_opt=self._pandoc_opt)
 
-    async def _async_search_faculty(self, faculty: pd.Series, out_dir, page: Page, parse=False):
+    async def _async_run_rows(self, rows, handler, key_fn, concurrency=1, max_tries=3, delay=1.):
+        """
+        Run handler over rows with a pool of pages
+
+        Rows that share the same key write to the same output directory,
+        so they are handled one after another by the same worker to keep
+        the output the same as a serial run.
+        The browser lives through the whole run, a row that fails is retried on its own.
+
+        :param rows: list of pd.Series
+        :param handler: async function that accept a row and a page
+        :param key_fn: function to get the output key of a row
+        :param concurrency: int
+            The number of pages to use
+        :param max_tries: int
+            The max number of tries of a row
+        :param delay: float
+            The seconds to wait before retry a row
+        """
+        assert isinstance(self._browser_dir, str)
+        block_policy = self._new_block_policy()
+        launcher = launch_browser(self._browser_dir, block_policy=block_policy, profile=self._launch_profile)
+        async with BrowserPool(launcher, size=concurrency) as pool:
+            self._scheduler = self._new_scheduler()
+            self._ready_stats = ReadyStats()
+            self._llm = None
+            self._fetcher = HttpFetcher(self._proxy, max_per_host=self._http_max_per_host,
+                                        scheduler=self._scheduler) if self._http_fetch else None
+
+            self._cpu_pool = ProcessPoolExecutor(max_workers=max(1, self._cpu_workers))
+            pipeline = self._new_pipeline()
+            try:
+                # the browser workers only scrape, the pipeline converts and parses pages at the same time
+                async with pipeline:
+                    self._pipeline = pipeline
+                    failed = await pool.run(group_by_key(rows, key_fn), handler, max_tries=max_tries, delay=delay)
+                for row in failed:
+                    logger.error(f'fail to process row {key_fn(row)}')
+            finally:
+                self._pipeline = None
+                self._cpu_pool.shutdown()
+                self._cpu_pool = None
+                logger.info(f'pipeline stats: {pipeline.stats()}')
+                logger.info(f'browser pool stats: {pool.stats()}')
+                self._log_llm_cache_stats()
+                logger.info(f'blocked requests: {block_policy.stats()}')
+                ready_summary = self._ready_stats.summary()
+                if ready_summary:
+                    logger.info(f'page ready time: {ready_summary}, timeouts: {self._ready_stats.timeouts}')
+                throttled = self._scheduler.stats()
+                if throttled:
+                    logger.info(f'throttled hosts: {throttled}')
+                if self._page_cache is not None:
+                    logger.info(f'page cache stats: {self._page_cache.stats()}')
+                if self._search_cache is not None:
+                    logger.info(f'search cache stats: {self._search_cache.stats()}')
+                if self._fetcher is not None:
+                    logger.info(f'http fetch stats: {self._fetcher.stats()}')
+                    await self._fetcher.aclose()
+                    self._fetcher = None
+
+    async def _async_search_faculty(self, faculty: 'pd.Series', out_dir, page: Page, parse=False):
         """
         Extract faculty member information from web page
         """
@@ -365,48 +648,12 @@ class HunterCmd:
         with open(index_file, 'w', encoding='utf-8') as f:
             f.write(faculty.to_json())
 
-        # scrape faculty page
+        # scrape and parse faculty page
         faculty_html_file = os.path.join(faculty_dir, 'faculty.html')
-        faculty_md_file = faculty_html_file + '.md'
-        faculty_jsonl_file = faculty_md_file + '.jsonl'
-
-        if not os.path.exists(faculty_html_file):
-            html = await self._async_scrape_url(url, page)
-            html = clean_html(html, keep_attrs=True)
-            with open(faculty_html_file, 'w', encoding='utf-8') as f:
-                f.write(html)
-
-        if not os.path.exists(faculty_md_file):
-            self.pandoc_convert(faculty_html_file, faculty_md_file)
-
-        # parse faculty page
-        if not parse or os.path.exists(faculty_jsonl_file):
-            return
+        await self._async_process_url(url, faculty_html_file, out_dir, page, 'faculty',
+                                      parse=parse, keep_attrs=True)
 
-        with open(faculty_md_file, 'r', encoding='utf-8') as f:
-            faculty_md_content = f.read()
-
-        answer = ''
-        try:
-            res = self._get_open_ai_response(
-                client=self._get_open_ai_client(),
-                prompt=prompt.RETRIVE_FACULTY_MEMBERS,
-                text='\n'.join([
-                    'Markdown: """',
-                    faculty_md_content,
-                    '"""',
-                ])
-            )
-            answer = res.choices[0].message.content
-            data = next(get_md_code_block(answer, '```json')).strip()
-            obj = jsonl_loads(data)
-            with open(faculty_jsonl_file, 'w', encoding='utf-8') as f:
-                jsonl_dump(f, obj)
-        except Exception as e:
-            logger.exception(f'fail to parse json data: {faculty_md_file}')
-            logger.info(f'answer: {answer}')
-
-    async def _async_search_cv(self, profile: pd.Series, out_dir, page: Page,
+    async def _async_search_cv(self, profile: 'pd.Series', out_dir, page: Page,
                                max_search=3, profile_url=None, parse=False):
         name = profile['name']
         institute = profile['institute']
@@ -425,7 +672,7 @@ class HunterCmd:
 
         if not os.path.exists(gs_result_file):
             gs_results = await self._async_google_search(search_keyword, page)
-            json_dump_file(gs_results, gs_result_file)
+            write_text_atomic(gs_result_file, json.dumps(gs_results, ensure_ascii=False, indent=2))
         else:
             gs_results = json_load_file(gs_result_file)
 
@@ -433,50 +680,15 @@ class HunterCmd:
         urls = [r['url'] for r in gs_results if valid_cv_url(r['url'])][:max_search]
         if profile_url:
             urls.append(profile_url)
+        urls = dedup_urls(urls)
 
         for url in urls:
-            # scrape cv html
+            # scrape and parse cv
             filename = url_to_key(url)
             cv_html_file = os.path.join(cv_dir, f'cv-{filename}')
-            cv_md_file = cv_html_file + '.md'
-            cv_json_file = cv_md_file + '.json'
-
-            if not os.path.exists(cv_html_file):
-                cv_html = await self._async_scrape_url(url, page)
-                cv_html = clean_html(cv_html)
-                with open(cv_html_file, 'w', encoding='utf-8') as f:
-                    f.write(cv_html)
-
-            if not os.path.exists(cv_md_file):
-                self.pandoc_convert(cv_html_file, cv_md_file)
-
-            # parse cv
-            if not parse or os.path.exists(cv_json_file):
-                continue
-
-            with open(cv_md_file, 'r', encoding='utf-8') as f:
-                cv_md_content = f.read()
-            answer = ''
-            try:
-                res = self._get_open_ai_response(
-                    client=self._get_open_ai_client(),
-                    prompt=prompt.RETRIEVE_SCHOLAR_OBJECT,
-                    text='\n'.join([
-                        'Markdown: """',
-                        cv_md_content,
-                        '"""',
-                    ])
-                )
-                answer = res.choices[0].message.content
-                data = next(get_md_code_block(answer, '```json')).strip()
-                obj = json.loads(data)
-                json_dump_file(obj, cv_json_file)
-            except Exception as e:
-                logger.exception(f'fail to parse json data: {cv_md_file}')
-                logger.info(f'answer: {answer}')
-                continue
+            await self._async_process_url(url, cv_html_file, out_dir, page, 'cv', parse=parse)
 
-    async def _async_search_group(self, group: pd.Series, out_dir, page: Page,
+    async def _async_search_group(self, group: 'pd.Series', out_dir, page: Page,
                                   max_search=3, parse=False):
         advisor = group['advisor']
         institute = group['institute']
@@ -495,72 +707,61 @@ class HunterCmd:
         search_keywords = f'(research group of {advisor}) AND (members or people) AND (graduate or phd or postdoctoral) {institute}'
         if not os.path.exists(gs_search_file):
             gs_results = await self._async_google_search(search_keywords, page)
-            json_dump_file(gs_results, gs_search_file)
+            write_text_atomic(gs_search_file, json.dumps(gs_results, ensure_ascii=False, indent=2))
         else:
             gs_results = json_load_file(gs_search_file)
 
         # sort the results by if member in the title or snippet
         gs_results = sorted(gs_results, reverse=True, key=score_group_search)
-        urls = [r['url'] for r in gs_results if valid_group_url(r['url'])][:max_search]
+        urls = dedup_urls([r['url'] for r in gs_results if valid_group_url(r['url'])][:max_search])
         for url in urls:
+            # scrape and parse group members
             filename = url_to_key(url)
             group_html_file = os.path.join(group_dir, f'group-{filename}')
-            group_md_file = group_html_file + '.md'
-            group_jsonl_file = group_md_file + '.jsonl'
-
-            if not os.path.exists(group_html_file):
-                group_html = await self._async_scrape_url(url, page)
-                group_html = clean_html(group_html)
-                with open(group_html_file, 'w', encoding='utf-8') as f:
-                    f.write(group_html)
-
-            if not os.path.exists(group_md_file):
-                self.pandoc_convert(group_html_file, group_md_file)
-
-            # parse group members
-            if not parse or os.path.exists(group_jsonl_file):
-                continue
-
-            with open(group_md_file, 'r', encoding='utf-8') as f:
-                group_md_content = f.read()
-
-            answer = ''
-            try:
-                res = self._get_open_ai_response(
-                    client=self._get_open_ai_client(),
-                    prompt=prompt.RETRIVE_GROUP_MEMBERS,
-                    text='\n'.join([
-                        'Markdown: """',
-                        group_md_content,
-                        '"""',
-                    ]),
-                )
-                answer = res.choices[0].message.content
-                data = next(get_md_code_block(answer, '```json')).strip()
-                if not data:
-                    logger.warning(f'no data found for {group_md_file}')
-                    continue
-                # check if the data is valid jsonl
-                members = jsonl_loads(data)
-                with open(group_jsonl_file, 'w', encoding='utf-8') as f:
-                    jsonl_dump(f, members)
-            except Exception as e:
-                logger.exception(f'fail to parse json data: {group_md_file}')
-                logger.info(f'answer: {answer}')
-                continue
+            await self._async_process_url(url, group_html_file, out_dir, page, 'group', parse=parse)
 
     async def _async_google_search(self, keyword: str, page: Page):
-        await page.goto('https://www.google.com/ncr')
-        # add some random delay and mouse move to avoid bot detection
-        random_xy_seq = [(random.uniform(100, 500), random.uniform(100, 500))
-                         for _ in range(random.randint(3, 5))]
-        for x, y in random_xy_seq:
-            await page.mouse.move(x, y)
-            await asyncio.sleep(random.uniform(0.1, 0.2))
+        query = normalize_query(keyword)
+        key = hash_key('google', query)
+        if self._search_cache is not None:
+            entry = self._search_cache.get(
+                key, is_fresh=lambda e: time.time() - e['searched_at'] < self._search_cache_ttl)
+            if entry is not None:
+                return entry['results']
+
+        task = self._pending_searches.get(query)
+        if task is None:
+            task = asyncio.ensure_future(self._async_google_search_uncached(keyword, key, page))
+            self._pending_searches[query] = task
+            task.add_done_callback(lambda _: self._pending_searches.pop(query, None))
+        else:
+            logger.info(f'wait for the same search in flight: {keyword}')
+        return await task
+
+    async def _async_google_search_uncached(self, keyword: str, key: str, page: Page):
+        async with self._scheduler.slot(GOOGLE_URL):
+            results = await self._async_google_search_page(keyword, page)
+        if self._search_cache is not None:
+            self._search_cache.set(key, {
+                'query': normalize_query(keyword),
+                'searched_at': time.time(),
+                'results': results,
+            })
+        return results
+
+    async def _async_google_search_page(self, keyword: str, page: Page):
+        await page.goto(GOOGLE_URL)
+        # move mouse to look like a human, the pace of searches is controlled by scheduler
+        for _ in range(random.randint(3, 5)):
+            await page.mouse.move(random.uniform(100, 500), random.uniform(100, 500))
         await page.click('textarea[name="q"]')
         await page.fill('textarea[name="q"]', keyword)
         await page.press('textarea[name="q"]', 'Enter')
-        await page.wait_for_selector('div#search div.g[jscontroller][jsaction]')
+        await page.wait_for_selector(f'{GOOGLE_RESULT_SELECTOR}, form#captcha-form')
+        if '/sorry/' in page.url:
+            self._scheduler.report(GOOGLE_URL, THROTTLED)
+            raise RuntimeError(f'google asks for captcha when search: {keyword}')
+        self._scheduler.report(GOOGLE_URL, OK)
         result = await page.evaluate(
             '''() => Array.from(document.querySelectorAll('div#search div.g[jscontroller][jsaction]')).map(e => ({
             title: e.querySelector('h3')?.innerText,
@@ -569,52 +770,279 @@ class HunterCmd:
         }))''')
         return result
 
-    def _requests_get(self, url):
-        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0 '
-        if self._proxy:
-            proxies = {
-                'http': self._proxy,
-                'https': self._proxy,
-            }
+    async def _async_scrape_url(self, url, page: Page) -> 'FetchResult':
+        """
+        Get a page from page cache, or fetch it and save it to page cache
+
+        :return: FetchResult, error and challenge pages are returned as is but not cached
+        """
+        cache = self._page_cache
+        if cache is None:
+            return await self._async_fetch_url(url, page)
+
+        entry = cache.get(url)
+        if entry is not None and cache.is_fresh(entry):
+            cache.hits += 1
+            return FetchResult(cache.read(entry), 200, {})
+        result = await self._async_fetch_url(url, page, entry=entry)
+        if result.html is None and entry is not None:
+            cache.revalidated += 1
+            cache.touch(entry)
+            return FetchResult(cache.read(entry), 200, {})
+        cache.misses += 1
+        # error and challenge pages are not cached, or they would be used until the cache expires
+        if result.cacheable:
+            cache.put(url, result.html, result.headers.get('etag'), result.headers.get('last-modified'))  # type: ignore
         else:
-            proxies = None
-        return requests.get(url, proxies=proxies, headers={'User-Agent': user_agent})
-
-    async def _async_scrape_url(self, url, page: Page, delay=0.5):
-        await page.goto(url, timeout=60e3)
-        await page.wait_for_load_state('domcontentloaded')
-        if delay > 0:
-            await asyncio.sleep(delay)
-        if 'linkedin' in url:
-            await asyncio.sleep(5)  # wait for linkedin to load
-        # if there is cloudflare protection, try to solve it
-        # detect cloudflare protection
-        title = await page.title()
-        if 'just a moment' in title.lower():
-            await asyncio.sleep(10)
+            logger.info(f'page is not cached: {url}, status: {result.status}, challenge: {result.challenge}')
+        return result
+
+    async def _async_fetch_url(self, url, page: Page, entry=None) -> 'FetchResult':
+        """
+        Fetch a page with http client first, fallback to browser
+
+        :param entry: dict
+            The stale page cache entry to revalidate
+        :return: FetchResult, html is None if the cached page is not modified
+        """
+        async with self._scheduler.slot(url):
+            # static pages are fetched by http client, which is much faster than browser
+            if self._fetcher is not None:
+                res = await self._fetcher.fetch_response(url,
+                                                         etag=entry['etag'] if entry else '',
+                                                         last_modified=entry['last_modified'] if entry else '')
+                if res is not None:
+                    return FetchResult(None if res.status_code == 304 else res.text, res.status_code, res.headers)
+            if not self._scheduler.is_paused(url):
+                return await self._async_scrape_page(url, page)
+        # the host throttled the http client, wait for the pause in a new slot before loading it by browser
+        logger.info(f'wait for {urlparse(url).netloc} to load {url} by browser')
+        async with self._scheduler.slot(url):
+            return await self._async_scrape_page(url, page)
+
+    async def _async_scrape_page(self, url, page: Page) -> 'FetchResult':
+        start = time.monotonic()
+        res = await page.goto(url, timeout=60e3, wait_until='domcontentloaded')
+        # if there is cloudflare protection, wait for the challenge to be solved
+        passed = await wait_challenge(page)
+        if passed is not None and not passed:
+            logger.warning(f'challenge is not solved: {url}')
+        # report one signal per response
+        retry_after = parse_retry_after(res.headers) if res is not None else None
+        if passed is not None:
+            self._scheduler.report(url, CHALLENGE, retry_after)
+        elif res is not None and res.status in (429, 503):
+            self._scheduler.report(url, THROTTLED, retry_after)
+        elif res is None or res.status < 400:
+            self._scheduler.report(url, OK)
+
+        strategy = get_ready_strategy(url, self._ready_strategy, self._domain_ready)
+        ready = await wait_ready(page, strategy, timeout=self._ready_timeout)
+        self._ready_stats.add('challenge' if passed is not None else strategy, time.monotonic() - start, ready)
         content = await page.content()
-        return content
+        if res is None:
+            return FetchResult(content, 0, {}, passed)
+        return FetchResult(content, res.status, res.headers, passed)
+
+    def _new_block_policy(self):
+        # stylesheets are not needed to get the html either
+        return BlockPolicy(resource_types=DEFAULT_BLOCKED_TYPES + ('stylesheet',), max_size=self._block_max_size)
+
+    def _new_scheduler(self):
+        rate = 1. / self._domain_interval if self._domain_interval > 0 else 0.
+        return HostScheduler(max_concurrency=self._max_per_domain, rate=rate)
+
+    async def _async_process_url(self, url, html_file, out_dir, page: Page, kind: str,
+                                 parse=False, keep_attrs=False):
+        """
+        Scrape a page and submit it to be cleaned, converted and parsed,
+        the stage of the page is tracked in the job store of out_dir
+
+        :param html_file: str
+            The file to save cleaned html, the markdown and parsed data are saved next to it
+        :param kind: str
+            The kind of the page, one of EXTRACT_TASKS
+        """
+        job = PageJob(self._get_job_store(out_dir), os.path.relpath(html_file, out_dir),
+                      url, None, html_file, kind, parse, keep_attrs)
+        store = job.store
+        if store.is_failed(job.key):
+            logger.warning(f'skip {url} as it failed too many times: {store.get(job.key).last_error}')  # type: ignore
+            return
+
+        if not store.is_done(job.key, 'cleaned', html_file):
+            try:
+                result = await self._async_scrape_url(url, page)
+                # the row is retried by browser pool, and the page is skipped after max_job_errors
+                if not result.cacheable:
+                    raise RuntimeError(f'fail to scrape {url}, status: {result.status}, challenge: {result.challenge}')
+            except Exception as e:
+                store.fail(job.key, e, url=url)
+                raise
+            store.mark(job.key, 'scraped', url=url)
+            job = job._replace(html=result.html)
+        elif store.is_done(job.key, 'converted', job.md_file) and (
+                not parse or store.is_done(job.key, 'parsed', job.out_file)):
+            return
+
+        assert self._pipeline is not None, 'pages must be processed in a pipeline'
+        await self._pipeline.put(job)
+
+    async def _async_convert_stage(self, job: 'PageJob') -> Optional['PageJob']:
+        """
+        Clean and convert a scraped page to markdown in cpu pool
+        """
+        store = job.store
+        # a page scraped again is always converted again
+        convert = job.html is not None or not store.is_done(job.key, 'converted', job.md_file)
+        try:
+            if job.html is not None:
+                md = await self._run_cpu(functools.partial(
+                    clean_page, job.html, job.html_file, keep_attrs=job.keep_attrs,
+                    html_parser=self._html_parser, to_markdown=self._converter == 'python'))
+                store.mark(job.key, 'cleaned')
+                if md is not None:
+                    write_text_atomic(job.md_file, md)
+                    convert = False
+            if convert:
+                await self._run_cpu(functools.partial(convert_page, job.html_file, job.md_file, self._get_convert_fn()))
+        except Exception as e:
+            store.fail(job.key, e, url=job.url)
+            raise
+        store.mark(job.key, 'converted')
+        return job._replace(html=None) if job.parse else None
+
+    async def _run_cpu(self, fn):
+        if self._cpu_pool is None:
+            return fn()
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_pool, fn)
+
+    async def _async_extract_stage(self, job: 'PageJob'):
+        """
+        Extract data from the markdown of a page with LLM
+        """
+        if job.store.is_done(job.key, 'parsed', job.out_file):
+            return None
+        data = await self._async_extract_data(job.md_file, job.kind)
+        if data is None:
+            job.store.fail(job.key, 'fail to parse')
+            return None
+        return job, data
+
+    async def _async_write_stage(self, item):
+        """
+        Save the extracted data of a page
+        """
+        job, data = item
+        write_extracted(job.out_file, job.kind, data)
+        job.store.mark(job.key, 'parsed')
+
+    def _new_pipeline(self):
+        return (Pipeline()
+                .add_stage('convert', self._async_convert_stage, self._cpu_workers, self._queue_size)
+                .add_stage('extract', self._async_extract_stage,
+                           self._extract_concurrency or self._llm_concurrency, self._queue_size)
+                .add_stage('write', self._async_write_stage, 1, self._queue_size))
+
+    def _get_job_store(self, out_dir) -> JobStore:
+        out_dir = os.path.abspath(out_dir)
+        if out_dir not in self._job_stores:
+            os.makedirs(out_dir, exist_ok=True)
+            self._job_stores[out_dir] = JobStore(os.path.join(out_dir, JOB_STORE_FILE),
+                                                 max_errors=self._max_job_errors)
+        return self._job_stores[out_dir]
+
+    async def _async_extract(self, md_file: str, out_file: str, kind: str):
+        """
+        Extract data from markdown file with LLM and save it to out_file
+
+        :param kind: str
+            The kind of markdown file, one of EXTRACT_TASKS
+        :return: bool
+            False if fail to extract data
+        """
+        data = await self._async_extract_data(md_file, kind)
+        if data is None:
+            return False
+        write_extracted(out_file, kind, data)
+        return True
+
+    async def _async_extract_data(self, md_file: str, kind: str):
+        """
+        Extract data from markdown file with LLM
+
+        Faculty and group pages are split into chunks that fit chunk_tokens,
+        the members found in each chunk are merged.
+
+        :return: the data of cv, or the records of faculty and group pages, None if fail to extract data
+        """
+        with open(md_file, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+
+        url_map = {}
+        if self._prune_md:
+            pruned, url_map = prune_markdown(md_content)
+            logger.info(f'{md_file}: {estimate_tokens(md_content)} -> {estimate_tokens(pruned)} tokens after pruning')
+            md_content = pruned
+
+        chunks = [md_content] if kind == 'cv' else split_markdown(md_content, self._chunk_tokens)
+        if len(chunks) > 1:
+            logger.info(f'split {md_file} into {len(chunks)} chunks')
+        try:
+            results = await asyncio.gather(*[self._async_extract_text(chunk, kind) for chunk in chunks])
+        except Exception as e:
+            logger.exception(f'fail to parse json data: {md_file}')
+            return None
+
+        results = restore_urls(results, url_map)
+        if kind == 'cv':
+            return results[0]
+        items = merge_records(results)
+        if not items:
+            logger.warning(f'no data found for {md_file}')
+        return items
+
+    async def _async_extract_text(self, md_content: str, kind: str):
+        """
+        Extract data from markdown text with LLM, raise error if the answer is invalid
+
+        :return: dict for cv, list of dict for others
+        """
+        answer = ''
+        try:
+            res = await self._async_get_open_ai_response(
+                prompt=EXTRACT_TASKS[kind][0],
+                text='\n'.join([
+                    'Markdown: """',
+                    md_content,
+                    '"""',
+                ])
+            )
+            answer = res.choices[0].message.content
+            data = next(get_md_code_block(answer, '```json')).strip()
+            if kind == 'cv':
+                return json.loads(data)
+            # check if the data is valid jsonl
+            return jsonl_loads(data) if data else []
+        except Exception:
+            logger.info(f'answer: {answer}')
+            raise
 
     def _get_open_ai_client(self):
-        base_url = config.get('openai_base_url')
-        api_key = config.get('openai_api_key')
-        client = OpenAI(base_url=base_url, api_key=api_key)
-        return client
-
-    def _get_open_ai_response(self, client: OpenAI, prompt, text):
-        messages = [
-            {'role': 'system', 'content': prompt},
-            {'role': 'user', 'content': text},
-        ]
-        res = client.chat.completions.create(
-            model='deepseek-chat',
-            messages=messages,  # type: ignore
-            stream=False,
-            max_tokens=4096 * 2,
-        )
-        with open(self._openai_log, 'a', encoding='utf-8') as f:
-            json.dump(res.model_dump(), f)
-        return res
+        return get_openai_client(config.get('openai_base_url'), config.get('openai_api_key'))
+
+    async def _async_get_open_ai_response(self, prompt, text):
+        if self._llm is None:
+            self._llm = LlmRunner(self._get_open_ai_client(),
+                                  concurrency=self._llm_concurrency,
+                                  max_retries=self._llm_max_retries,
+                                  log_file=self._openai_log,
+                                  cache=self._llm_cache)
+        return await self._llm.chat(prompt, text)
+
+    def _log_llm_cache_stats(self):
+        if self._llm_cache is not None:
+            logger.info('llm cache hits: {hits}, misses: {misses}'.format(**self._llm_cache.stats()))
 
     def load_excel(self, excel_file):
         import pandas as pd
@@ -622,6 +1050,170 @@ class HunterCmd:
             return pd.read_excel(f)
 
 
+class FetchResult(NamedTuple):
+    """
+    A page fetched by http client or browser
+    """
+    html: Optional[str]
+    status: int
+    headers: Mapping[str, str]
+    # None if it is not a challenge page, otherwise whether the challenge is solved
+    challenge: Optional[bool] = None
+
+    @property
+    def cacheable(self):
+        return self.html is not None and self.status < 400 and self.challenge is not False
+
+
+class PageJob(NamedTuple):
+    store: JobStore
+    key: str
+    url: str
+    html: Optional[str]  # the scraped html, None if the cleaned html is saved already
+    html_file: str
+    kind: str
+    parse: bool
+    keep_attrs: bool
+
+    @property
+    def md_file(self):
+        return self.html_file + '.md'
+
+    @property
+    def out_file(self):
+        return self.md_file + EXTRACT_TASKS[self.kind][1]
+
+
+def clean_page(html, html_file, keep_attrs=False, html_parser='html.parser', to_markdown=False) -> Optional[str]:
+    """
+    Clean scraped html and save it
+
+    :param html: str
+        The scraped html
+    :param to_markdown: bool
+        Whether to convert the cleaned tree to markdown in process
+    :return: the markdown, None if it is not converted
+    """
+    from auto_assist.html2md import soup_to_markdown, html_to_markdown
+    if html_parser == 'lxml':
+        cleaned = clean_html(html, keep_attrs=keep_attrs, parser='lxml')
+        convert = functools.partial(html_to_markdown, cleaned)
+    else:
+        soup = clean_soup(html, keep_attrs=keep_attrs)
+        cleaned = str(soup)
+        convert = functools.partial(soup_to_markdown, soup)
+    write_text_atomic(html_file, cleaned)
+    if not to_markdown:
+        return None
+    try:
+        return convert()
+    except Exception:
+        logger.exception(f'fail to convert {html_file} in process, convert the saved file instead')
+        return None
+
+
+def convert_page(html_file, md_file, convert_fn=None):
+    """
+    Convert a cleaned html file to markdown
+
+    :param convert_fn: function
+        The function to convert html file to markdown file, default to python_convert
+    """
+    (convert_fn or python_convert)(html_file, md_file + '.tmp')
+    os.replace(md_file + '.tmp', md_file)
+
+
+def dedup_urls(urls: Iterable[str]) -> List[str]:
+    """
+    Remove urls that are saved to the same file, the first one is kept
+    """
+    unique: Dict[str, str] = {}
+    for url in urls:
+        unique.setdefault(url_to_key(url), url)
+    return list(unique.values())
+
+
+def write_extracted(out_file, kind, data):
+    """
+    Save the extracted data of a page, a json file for cv, otherwise a jsonl file
+    """
+    if kind == 'cv':
+        write_text_atomic(out_file, json.dumps(data, ensure_ascii=False, indent=2))
+        return
+    # an empty file is written for a page without records, so that it is not parsed again
+    buf = io.StringIO()
+    jsonl_dump(buf, data)
+    write_text_atomic(out_file, buf.getvalue())
+
+
+def pandoc_convert(in_html, out_md, pandoc_cmd='pandoc', pandoc_opt=''):
+    return sp.check_call(f'{pandoc_cmd} {pandoc_opt} "{in_html}" -o "{out_md}"', shell=True)
+
+
+def python_convert(in_html, out_md):
+    from auto_assist.html2md import html_to_markdown
+    with open(in_html, 'r', encoding='utf-8') as f:
+        md = html_to_markdown(f)
+    with open(out_md, 'w', encoding='utf-8') as f:
+        f.write(md)
+
+
+def merge_records(chunks: List[List[Dict[str, Any]]], key='name') -> List[Dict[str, Any]]:
+    """
+    Merge records extracted from the chunks of a page
+
+    A record with the same key (case insensitive) as a record of a previous chunk is merged into it,
+    the first non-empty value of each field is kept.
+    Records of the same chunk are never merged as different people may share a name,
+    and records without key are kept as is.
+    """
+    merged: List[Dict[str, Any]] = []
+    previous: Dict[str, Dict[str, Any]] = {}
+    for records in chunks:
+        current: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            k = str(record.get(key) or '').strip().lower()
+            if k in previous:
+                target = previous[k]
+                for field, value in record.items():
+                    if value not in (None, '') and target.get(field) in (None, ''):
+                        target[field] = value
+                continue
+            record = dict(record)
+            merged.append(record)
+            if k:
+                current.setdefault(k, record)
+        for k, record in current.items():
+            previous.setdefault(k, record)
+    return merged
+
+
+def iter_prompts():
+    """
+    Iterate (name, prompt) of all prompts defined in prompt module
+    """
+    for name in dir(prompt):
+        value = getattr(prompt, name)
+        if name.isupper() and isinstance(value, str):
+            yield name, value
+
+
+def get_extract_kind(md_file: str) -> Optional[str]:
+    """
+    Get the kind of markdown file by its name, return None if it is not supported
+    """
+    filename = os.path.basename(md_file)
+    if not filename.endswith('.md'):
+        return None
+    if filename == 'faculty.html.md':
+        return 'faculty'
+    if filename.startswith('cv-'):
+        return 'cv'
+    if filename.startswith('group-'):
+        return 'group'
+    return None
+
+
 def is_graduate(title: str):
     title = title.lower()
     for keyword in ['phd', 'doctor', 'ph.d', 'post']:
@@ -632,6 +1224,180 @@ def is_graduate(title: str):
     return False
 
 
+def is_graduates(titles: 'pd.Series') -> 'pd.Series':
+    """
+    Vectorized is_graduate for a Series of titles
+    """
+    titles = titles.str.lower()
+    return (titles.str.contains('phd|doctor|ph\\.d|post') |
+            (titles.str.contains('graduate', regex=False) & ~titles.str.contains('under', regex=False)))
+
+
+def str_column(df: 'pd.DataFrame', column: str) -> 'pd.Series':
+    """
+    Get a column as strings, missing column or values are empty strings
+    """
+    import pandas as pd
+    if column not in df:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[column].fillna('').astype(str)
+
+
+def load_jsonl_frame(sources: Iterable[Tuple[str, Dict[str, Any]]]) -> 'pd.DataFrame':
+    """
+    Load records of jsonl files into one DataFrame
+
+    :param sources: list of (jsonl_file, meta)
+        The fields of meta are set to every record of the file
+    """
+    import pandas as pd
+    records = []
+    owners = []
+    metas = []
+    for i, (jsonl_file, meta) in enumerate(sources):
+        metas.append(meta)
+        for record in iter_jsonl(jsonl_file):
+            if not isinstance(record, dict):
+                logger.warning(f'invalid record in {jsonl_file}: {record}')
+                continue
+            records.append(record)
+            owners.append(i)
+    df = pd.DataFrame.from_records(records)
+    meta_df = pd.DataFrame(metas)
+    for column in meta_df.columns:
+        df[column] = meta_df[column].to_numpy()[owners]
+    return df
+
+
+def join_profile_urls(profile_urls: 'pd.Series', base_urls: 'pd.Series') -> 'pd.Series':
+    """
+    Join relative profile urls with the base urls of their faculty pages,
+    a url starting with / is joined with the host of the base url
+    """
+    import numpy as np
+    relative = (profile_urls != '') & ~profile_urls.str.startswith('http')
+    roots = base_urls.str.extract(r'^(.{0,8}[^/]*)', expand=False)
+    joined = np.where(profile_urls.str.startswith('/'), roots + profile_urls, base_urls + profile_urls)
+    return profile_urls.where(~relative, joined)
+
+
+def collect_faculties(faculty_dirs: Iterable[str]) -> 'pd.DataFrame':
+    """
+    Collect assistant professors from faculty directories
+
+    :param faculty_dirs: list of str
+        The faculty directories that contains faculty members
+    """
+    sources = []
+    for faculty_dir in faculty_dirs:
+        index = json_load_file(os.path.join(faculty_dir, 'index.json'))
+        faculty_json_file = os.path.join(faculty_dir, 'faculty.html.md.jsonl')
+        base_url = index.get('FacultyPage', '')
+        assert isinstance(base_url, str), f'invalid base url: {base_url}'
+        sources.append((faculty_json_file, {
+            'src': index['FacultyPage'],
+            'institute': index.get('Institute', ''),
+            'department': index.get('Department', ''),
+            '_base_url': base_url.split('?', maxsplit=1)[0],  # remove query string
+            '_file': faculty_json_file,
+        }))
+    df = load_jsonl_frame(sources)
+    if df.empty:
+        return df
+
+    if 'profile_url' in df:
+        df['profile_url'] = df['profile_url'].where(
+            df['profile_url'].isna(), join_profile_urls(str_column(df, 'profile_url'), df['_base_url']))
+    title = str_column(df, 'title').str.lower()
+    for faculty_json_file, count in df.loc[title == '', '_file'].value_counts(sort=False).items():
+        logger.warning(f'title is empty for {count} faculties in {faculty_json_file}')
+    is_candidate = ((title.str.contains('assist', regex=False) & title.str.contains('prof', regex=False)) |
+                    title.str.contains('aprof', regex=False))
+    return df.loc[is_candidate].drop(columns=['_base_url', '_file']).reset_index(drop=True)
+
+
+def collect_groups(group_dirs: Iterable[str]) -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+    """
+    Collect groups and their chinese graduate members from group directories
+
+    Members are deduplicated by name (case insensitive) before filtering.
+
+    :param group_dirs: list of str
+        The group directories that contains group members
+    :return: (groups, candidates)
+    """
+    import pandas as pd
+    groups = []
+    sources = []
+    for group_dir in group_dirs:
+        group = json_load_file(os.path.join(group_dir, 'index.json'))
+        google_results = json_load_file(os.path.join(group_dir, 'google-search.json'))
+        urls = [r['url'] for r in google_results if valid_group_url(r['url'])][:3]
+        meta = {
+            'institute': group.get('institute', ''),
+            'group': group.get('group', ''),
+            'advisor': group.get('advisor', ''),
+        }
+        groups.append({**meta, 'urls': '\r\n'.join(urls)})
+        for group_file in expand_globs([os.path.join(group_dir, 'group-*.jsonl')]):
+            sources.append((group_file, meta))
+
+    columns = ['name', 'title', 'email', 'advisor', 'group', 'institute', 'description']
+    df = load_jsonl_frame(sources)
+    members = pd.DataFrame({column: str_column(df, column) for column in columns}, index=df.index)
+    members = members[~members['name'].str.lower().duplicated()]
+
+    # is chinese name is decided by LLM, double check is required
+    if 'is_chinese' in df:
+        is_chinese = df.loc[members.index, 'is_chinese'].fillna(False).astype(bool)
+    else:
+        is_chinese = pd.Series(False, index=members.index)
+    is_chinese[~is_chinese] = is_chinese_names(members.loc[~is_chinese, 'name'])
+    # filter out non-graduate students, if title is empty also keep it
+    is_candidate = is_chinese & ((members['title'] == '') | is_graduates(members['title']))
+    return pd.DataFrame(groups), members.loc[is_candidate].reset_index(drop=True)
+
+
+def benchmark_collect_groups(n_members=100_000, group_size=20, seed=0):
+    """
+    Benchmark collect_groups over a synthetic corpus of group directories
+
+    :param n_members: int
+        The number of members in the corpus
+    :param group_size: int
+        The number of members of a group
+    """
+    import tempfile
+    rng = random.Random(seed)
+    names = ['Xiaoming Li', 'Wei Zhang', 'Zhang-Wei', 'Alice Smith', 'Robert Brown', 'Diana Prince', 'Mei Chen']
+    titles = ['PhD Student', 'Postdoc', 'Undergraduate Student', 'Graduate Student', 'Professor', '']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        group_dirs = []
+        for g in range(0, n_members, group_size):
+            group_dir = os.path.join(tmp_dir, f'group-{g}')
+            os.makedirs(group_dir)
+            json_dump_file({'institute': f'Institute {g % 97}', 'group': f'Group {g}', 'advisor': f'Advisor {g}'},
+                           os.path.join(group_dir, 'index.json'))
+            json_dump_file([{'url': f'https://example.com/group-{g}'}], os.path.join(group_dir, 'google-search.json'))
+            with JsonlWriter(os.path.join(group_dir, 'group-0.jsonl')) as writer:
+                writer.write_all({
+                    'name': f'{rng.choice(names)} {i}', 'title': rng.choice(titles),
+                    'email': f'member{i}@example.com', 'is_chinese': rng.random() < 0.3,
+                } for i in range(g, min(g + group_size, n_members)))
+            group_dirs.append(group_dir)
+
+        start = time.perf_counter()
+        group_df, candidate_df = collect_groups(group_dirs)
+        elapsed = time.perf_counter() - start
+    return {
+        'members': n_members,
+        'groups': len(group_df),
+        'candidates': len(candidate_df),
+        'seconds': round(elapsed, 3),
+        'members_per_second': round(n_members / elapsed),
+    }
+
+
 def valid_cv_url(url):
     if '.pdf' in url:
         return False
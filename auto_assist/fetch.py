@@ -0,0 +1,227 @@
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+import asyncio
+import logging
+import codecs
+import re
+
+import httpx
+
+from .lib import get_logger
+from .scheduler import HostScheduler, OK, THROTTLED, CHALLENGE
+
+logger = get_logger(__name__)
+# httpx logs every request at info level
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36 Edg/130.0.0.0'
+
+# sites that always render with javascript or block plain http clients
+BROWSER_ONLY_DOMAINS = ('linkedin.com', 'scholar.google.', 'researchgate.net')
+
+# pages smaller than this with little visible text are likely rendered by javascript
+MIN_TEXT_LEN = 200
+
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+_BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+_STRIP_RE = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<noscript\b.*?</noscript>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_JS_REQUIRED_RE = re.compile(
+    r'(enable javascript|javascript is (disabled|required)|requires javascript|'
+    r'please turn on javascript|cf-browser-verification|challenge-platform|_cf_chl_opt)',
+    re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w:.-]+)', re.IGNORECASE)
+_CHALLENGE_TITLES = ('just a moment', 'attention required', 'access denied', 'please wait', 'ddos-guard')
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Get the seconds to wait from Retry-After header
+    """
+    try:
+        return float(headers.get('retry-after', ''))
+    except ValueError:
+        return None
+
+
+def is_cloudflare(response: httpx.Response) -> bool:
+    return response.status_code in (403, 429, 503) and (
+        'cf-ray' in response.headers or 'cloudflare' in response.headers.get('server', '').lower())
+
+
+def get_html_encoding(response: httpx.Response) -> Optional[str]:
+    """
+    Get the encoding of a html response
+
+    The charset of Content-Type header is used first, then <meta charset> of the page,
+    then the encoding detected by charset_normalizer.
+
+    :return: the encoding, or None if it is unknown
+    """
+    content = response.content
+    declared = [response.charset_encoding]
+    m = _META_CHARSET_RE.search(content[:4096])
+    declared.append(m.group(1).decode('ascii') if m else None)
+    for encoding in declared:
+        if not encoding:
+            continue
+        try:
+            content.decode(encoding)
+            return codecs.lookup(encoding).name
+        except (LookupError, UnicodeDecodeError):
+            logger.info(f'invalid charset {encoding} of {response.url}')
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return None
+    best = from_bytes(content).best()
+    return best.encoding if best is not None else None
+
+
+def needs_browser(response: httpx.Response) -> Optional[str]:
+    """
+    Check if a page fetched by http client must be loaded by browser instead
+
+    :return: the reason, or None if the response can be used as is
+    """
+    if is_cloudflare(response):
+        return 'cloudflare'
+    if response.status_code != 200:
+        return f'status {response.status_code}'
+    content_type = response.headers.get('content-type', '')
+    if 'html' not in content_type:
+        return f'content type {content_type}'
+    encoding = get_html_encoding(response)
+    if encoding is None:
+        return 'unknown charset'
+    # httpx decodes as utf-8 if the header has no charset
+    response.encoding = encoding
+    text = response.text
+    m = _TITLE_RE.search(text)
+    title = m.group(1).strip().lower() if m else ''
+    if any(t in title for t in _CHALLENGE_TITLES):
+        return f'challenge page: {title}'
+    m = _BODY_RE.search(text)
+    visible = _STRIP_RE.sub(' ', m.group(1) if m else text)
+    visible_len = len(' '.join(visible.split()))
+    if visible_len < MIN_TEXT_LEN:
+        if _JS_REQUIRED_RE.search(text):
+            return 'javascript required'
+        return f'little text: {visible_len} chars'
+    return None
+
+
+class HttpFetcher:
+
+    def __init__(self, proxy: Optional[str] = None, max_per_host=4, timeout=20., http2: Optional[bool] = None,
+                 scheduler: Optional[HostScheduler] = None):
+        """
+        Fetch pages with a pooled async http client, keep-alive connections are reused across pages
+
+        :param proxy: str
+            The proxy url
+        :param max_per_host: int
+            The max number of connections to the same host
+        :param timeout: float
+            The timeout in seconds of a request
+        :param http2: bool
+            Whether to use HTTP/2, default to True if h2 is installed
+        :param scheduler: HostScheduler
+            The scheduler to report throttled responses to
+        """
+        if http2 is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+        self._proxy = proxy
+        self._max_per_host = max_per_host
+        self._timeout = timeout
+        self._http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._scheduler = scheduler
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.direct = 0
+        self.fallback = 0
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """
+        Fetch a page, return None if the page must be loaded by browser
+        """
+        res = await self.fetch_response(url)
+        return None if res is None else res.text
+
+    async def fetch_response(self, url: str, etag='', last_modified='') -> Optional[httpx.Response]:
+        """
+        Fetch a page, return None if the page must be loaded by browser
+
+        :param etag: str
+            The ETag of cached page, a 304 response is returned if the page is not modified
+        :param last_modified: str
+            The Last-Modified of cached page
+        """
+        host = urlparse(url).netloc.lower()
+        if any(d in host for d in BROWSER_ONLY_DOMAINS):
+            self.fallback += 1
+            return None
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self._max_per_host)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            async with self._host_semaphores[host]:
+                res = await self._get_client().get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.info(f'fail to fetch {url} with http client, fallback to browser: {e!r}')
+            self.fallback += 1
+            return None
+        if res.status_code == 304 and headers:
+            self._report(url, OK)
+            return res
+        if res.status_code in (429, 503) or is_cloudflare(res):
+            self._report(url, CHALLENGE if is_cloudflare(res) else THROTTLED, parse_retry_after(res.headers))
+        reason = needs_browser(res)
+        if reason is not None:
+            logger.info(f'fallback to browser for {url}: {reason}')
+            self.fallback += 1
+            return None
+        self._report(url, OK)
+        self.direct += 1
+        return res
+
+    def stats(self) -> Dict[str, int]:
+        return {'direct': self.direct, 'fallback': self.fallback}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _report(self, url: str, signal: str, retry_after: Optional[float] = None):
+        if self._scheduler is not None:
+            self._scheduler.report(url, signal, retry_after)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self._http2,
+                proxy=self._proxy,
+                timeout=self._timeout,
+                follow_redirects=True,
+                headers={
+                    'User-Agent': USER_AGENT,
+                    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.9',
+                },
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._client
@@ -0,0 +1,138 @@
+from bs4 import BeautifulSoup, NavigableString, Tag, Comment, Doctype
+from bs4.element import PageElement
+from typing import List
+
+import re
+
+
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside',
+    'form', 'fieldset', 'figure', 'figcaption', 'address', 'details', 'summary',
+    'dl', 'dt', 'dd', 'body', 'html', 'center',
+}
+SKIP_TAGS = {'script', 'style', 'noscript', 'svg', 'img', 'iframe', 'head', 'title', 'meta', 'link', 'template'}
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+_WS = re.compile(r'\s+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+_LEADING_SPACE = re.compile(r'^ (?=\S)')
+
+
+def html_to_markdown(markup) -> str:
+    """
+    Convert html to markdown in process
+
+    :param markup: str or file
+        The html to convert
+    """
+    return soup_to_markdown(BeautifulSoup(markup, 'html.parser'))
+
+
+def soup_to_markdown(soup: Tag) -> str:
+    """
+    Convert a BeautifulSoup tree to markdown
+
+    Only the structure that matters for reading the page is kept:
+    headings, paragraphs, lists, tables, links, emphasis and preformatted text.
+    """
+    return _block(soup) + '\n'
+
+
+def _convert_children(tag: Tag) -> str:
+    return ''.join(_convert(child) for child in tag.children)
+
+
+def _convert(el: PageElement) -> str:
+    if isinstance(el, (Comment, Doctype)):
+        return ''
+    if isinstance(el, NavigableString):
+        return _WS.sub(' ', str(el))
+    if not isinstance(el, Tag):
+        return ''
+
+    name = el.name
+    if name in SKIP_TAGS:
+        return ''
+    if name in HEADING_TAGS:
+        text = _inline(el)
+        return f'\n\n{"#" * HEADING_TAGS[name]} {text}\n\n' if text else ''
+    if name in BLOCK_TAGS:
+        return f'\n\n{_convert_children(el)}\n\n'
+    if name == 'br':
+        return '\n'
+    if name == 'hr':
+        return '\n\n---\n\n'
+    if name in ('ul', 'ol'):
+        return f'\n\n{_convert_list(el)}\n\n'
+    if name == 'table':
+        return f'\n\n{_convert_table(el)}\n\n'
+    if name == 'pre':
+        return f'\n\n```\n{el.get_text().strip(chr(10))}\n```\n\n'
+    if name == 'blockquote':
+        text = _block(el)
+        return '\n\n' + '\n'.join('> ' + line if line else '>' for line in text.split('\n')) + '\n\n'
+    if name in ('strong', 'b'):
+        return _wrap(el, '**')
+    if name in ('em', 'i'):
+        return _wrap(el, '*')
+    if name == 'code':
+        text = el.get_text()
+        return f'`{text}`' if text.strip() else ''
+    if name == 'a':
+        text = _convert_children(el)
+        href = el.get('href')
+        if isinstance(href, str) and href and not href.startswith(('javascript:', '#')) and text.strip():
+            return f'[{text.strip()}]({href})'
+        return text
+    return _convert_children(el)
+
+
+def _wrap(el: Tag, mark: str) -> str:
+    text = _convert_children(el)
+    stripped = text.strip()
+    if not stripped:
+        return text
+    # keep the surrounding spaces outside of the marks
+    lead = ' ' if text[0].isspace() else ''
+    tail = ' ' if text[-1].isspace() else ''
+    return f'{lead}{mark}{stripped}{mark}{tail}'
+
+
+def _inline(el: Tag) -> str:
+    return _WS.sub(' ', _convert_children(el)).strip()
+
+
+def _block(el: Tag) -> str:
+    text = _convert_children(el)
+    # drop the space left by collapsing whitespace, but keep the indent of nested lists
+    lines = [_LEADING_SPACE.sub('', line.rstrip()) for line in text.split('\n')]
+    return _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip('\n')
+
+
+def _convert_list(el: Tag) -> str:
+    ordered = el.name == 'ol'
+    items: List[str] = []
+    for i, li in enumerate(el.find_all('li', recursive=False), start=1):
+        marker = f'{i}. ' if ordered else '- '
+        text = _block(li)
+        if not text:
+            continue
+        lines = text.split('\n')
+        indent = ' ' * len(marker)
+        items.append(marker + lines[0] + ''.join('\n' + (indent + line if line else '') for line in lines[1:]))
+    return '\n'.join(items)
+
+
+def _convert_table(el: Tag) -> str:
+    rows: List[List[str]] = []
+    for tr in el.find_all('tr'):
+        cells = [_inline(cell).replace('|', '\\|') for cell in tr.find_all(['td', 'th'], recursive=False)]
+        if any(cells):
+            rows.append(cells)
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    lines = ['| ' + ' | '.join(rows[0]) + ' |', '|' + '---|' * width]
+    lines.extend('| ' + ' | '.join(row) + ' |' for row in rows[1:])
+    return '\n'.join(lines)
@@ -0,0 +1,120 @@
+from typing import Any, Iterable, Iterator, IO
+
+import gzip
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# orjson parses integers out of 64 bits range as floats, a document with such long digits is parsed by json
+_LONG_DIGITS_RE = re.compile(r'\d{19}')
+_LONG_DIGITS_BYTES_RE = re.compile(rb'\d{19}')
+
+
+def loads(data) -> Any:
+    """
+    Parse a json document, orjson is used if installed
+
+    json is used instead for integers out of 64 bits range and NaN or Infinity written by json.dumps.
+    """
+    if orjson is not None:
+        long_digits = _LONG_DIGITS_BYTES_RE if isinstance(data, (bytes, bytearray, memoryview)) else _LONG_DIGITS_RE
+        if not long_digits.search(data):  # type: ignore
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize obj to utf-8 json without escaping non-ascii characters, orjson is used if installed
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. non str keys or integers out of 64 bits range
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def open_file(path: str, mode='rb') -> IO[bytes]:
+    """
+    Open a file in binary mode, .gz and .zst files are decompressed or compressed transparently
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)  # type: ignore
+    if path.endswith(('.zst', '.zstd')):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstandard is required to read or write .zst files, install it with: pip install zstandard')
+        return zstandard.open(path, mode)  # type: ignore
+    return open(path, mode)
+
+
+def iter_jsonl(path: str) -> Iterator[Any]:
+    """
+    Read records of a jsonl file one by one, blank lines are skipped
+
+    :param path: str
+        The jsonl file, can be compressed with gzip or zstd
+    """
+    with open_file(path, 'rb') as fp:
+        for line in fp:
+            if line.strip():
+                yield loads(line)
+
+
+class JsonlWriter:
+
+    def __init__(self, path: str, mode='wb', flush_size=1024 * 1024):
+        """
+        Write records to a jsonl file incrementally
+
+        :param path: str
+            The jsonl file, can be compressed with gzip or zstd
+        :param mode: str
+            'wb' to overwrite or 'ab' to append
+        :param flush_size: int
+            The bytes to buffer before writing to file
+        """
+        self._fp = open_file(path, mode)
+        self._flush_size = flush_size
+        self._buf = []
+        self._buf_size = 0
+        self.count = 0
+
+    def write(self, obj: Any):
+        data = dumps(obj) + b'\n'
+        self._buf.append(data)
+        self._buf_size += len(data)
+        self.count += 1
+        if self._buf_size >= self._flush_size:
+            self.flush()
+
+    def write_all(self, objs: Iterable[Any]):
+        for obj in objs:
+            self.write(obj)
+
+    def flush(self):
+        if self._buf:
+            self._fp.write(b''.join(self._buf))
+            self._buf.clear()
+            self._buf_size = 0
+        self._fp.flush()
+
+    def close(self):
+        self.flush()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,13 +1,24 @@
 from urllib.parse import urlparse
-from typing import Iterable, List
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+from concurrent.futures import ProcessPoolExecutor
 
+import functools
 import logging
+import html
+import time
 import glob
 import json
 import os
 import re
 
+from . import jsonl
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    import pandas as pd
+
+
+T = TypeVar('T')
 
 USER_HOME = os.path.join(os.path.expanduser("~"))
 
@@ -27,17 +38,101 @@ def contain_chinese(text):
     return re.search('[\u4e00-\u9fa5]', text) is not None
 
 
-def is_chinese_name(name):
+# table of all valid pinyin without tone
+PINYIN = frozenset(['a', 'o', 'e', 'er', 'ai', 'ao', 'ou', 'an', 'en', 'ang', 'eng', 'yi', 'ya', 'yao', 'ye', 'you', 'yan', 'yin', 'yang', 'ying', 'yong', 'wu', 'wa', 'wo', 'wai', 'wei', 'wan', 'wen', 'wang', 'weng', 'yu', 'yue', 'yuan', 'yun', 'ba', 'bo', 'bai', 'bei', 'bao', 'ban', 'ben', 'bang', 'beng', 'bi', 'biao', 'bie', 'bian', 'bin', 'bing', 'bu', 'pa', 'po', 'pai', 'pei', 'pao', 'pou', 'pan', 'pen', 'pang', 'peng', 'pi', 'piao', 'pie', 'pian', 'pin', 'ping', 'pu', 'ma', 'mo', 'me', 'mai', 'mei', 'mao', 'mou', 'man', 'men', 'mang', 'meng', 'mi', 'miao', 'mie', 'miu', 'mian', 'min', 'ming', 'mu', 'fa', 'fo', 'fei', 'fou', 'fan', 'fen', 'fang', 'feng', 'fu', 'da', 'de', 'dai', 'dei', 'dao', 'dou', 'dan', 'den', 'dang', 'deng', 'dong', 'di', 'diao', 'die', 'diu', 'dian', 'ding', 'du', 'duo', 'dui', 'duan', 'dun', 'ta', 'te', 'tai', 'tei', 'tao', 'tou', 'tan', 'tang', 'teng', 'tong', 'ti', 'tiao', 'tie', 'tian', 'ting', 'tu', 'tuo', 'tui', 'tuan', 'tun', 'na', 'ne', 'nai', 'nei', 'nao', 'nou', 'nan', 'nen', 'nang', 'neng', 'nong', 'ni', 'niao', 'nie', 'niu', 'nian', 'nin', 'niang', 'ning', 'nu', 'nuo', 'nuan', 'nv', 'nve', 'la', 'le', 'lai', 'lei', 'lao', 'lou', 'lan', 'lang', 'leng', 'long', 'li', 'lia', 'liao', 'lie', 'liu', 'lian', 'lin', 'liang', 'ling', 'lu', 'luo', 'luan', 'lun', 'lv', 'lve', 'ga', 'ge', 'gai', 'gei', 'gao', 'gou', 'gan', 'gen', 'gang', 'geng', 'gong', 'gu', 'gua', 'guo', 'guai', 'gui', 'guan', 'gun', 'guang', 'ka', 'ke', 'kai', 'kei', 'kao', 'kou', 'kan', 'ken', 'kang', 'keng', 'kong', 'ku', 'kua', 'kuo', 'kuai', 'kui', 'kuan', 'kun', 'kuang', 'ha', 'he', 'hai', 'hei', 'hao', 'hou', 'han', 'hen', 'hang', 'heng', 'hong', 'hu', 'hua', 'huo', 'huai', 'hui', 'huan', 'hun', 'huang', 'za', 'ze', 'zi', 'zai', 'zei', 'zao', 'zou', 'zan', 'zen', 'zang', 'zeng', 'zong', 'zu', 'zuo', 'zui', 'zuan', 'zun', 'ca', 'ce', 'ci', 'cai', 'cao', 'cou', 'can', 'cen', 'cang', 'ceng', 'cong', 'cu', 'cuo', 'cui', 'cuan', 'cun', 'sa', 'se', 'si', 'sai', 'sao', 'sou', 'san', 'sen', 'sang', 'seng', 'song', 'su', 'suo', 'sui', 'suan', 'sun', 'zha', 'zhe', 'zhi', 'zhai', 'zhei', 'zhao', 'zhou', 'zhan', 'zhen', 'zhang', 'zheng', 'zhong', 'zhu', 'zhua', 'zhuo', 'zhuai', 'zhui', 'zhuan', 'zhun', 'zhuang', 'cha', 'che', 'chi', 'chai', 'chao', 'chou', 'chan', 'chen', 'chang', 'cheng', 'chong', 'chu', 'chua', 'chuo', 'chuai', 'chui', 'chuan', 'chun', 'chuang', 'sha', 'she', 'shi', 'shai', 'shei', 'shao', 'shou', 'shan', 'shen', 'shang', 'sheng', 'shu', 'shua', 'shuo', 'shuai', 'shui', 'shuan', 'shun', 'shuang', 're', 'ri', 'rao', 'rou', 'ran', 'ren', 'rang', 'reng', 'rong', 'ru', 'rua', 'ruo', 'rui', 'ruan', 'run', 'ji', 'jia', 'jiao', 'jie', 'jiu', 'jian', 'jin', 'jiang', 'jing', 'jiong', 'ju', 'jue', 'juan', 'jun', 'qi', 'qia', 'qiao', 'qie', 'qiu', 'qian', 'qin', 'qiang', 'qing', 'qiong', 'qu', 'que', 'quan', 'qun', 'xi', 'xia', 'xiao', 'xie', 'xiu', 'xian', 'xin', 'xiang', 'xing', 'xiong', 'xu', 'xue', 'xuan', 'xun'])
+_MAX_PINYIN_LEN = max(len(p) for p in PINYIN)
+# common chinese surnames of two syllables
+COMPOUND_SURNAMES = frozenset([
+    'ouyang', 'sima', 'zhuge', 'shangguan', 'situ', 'dongfang', 'huangfu', 'yuchi', 'gongsun', 'murong',
+    'xiahou', 'zhangsun', 'linghu', 'duanmu', 'ximen', 'nangong', 'wenren', 'xianyu', 'zhongli', 'helian',
+])
+# separators between the syllables of a name token, e.g. Zhang-Wei, Xi'an
+_PINYIN_SEP_RE = re.compile(r"[-'’]")
+
+
+def is_chinese_name(name: str, max_syllables=2, concatenated=False):
+    """
+    Check if a name is pinyin
+
+    A name is pinyin if any of its tokens is a single syllable, a compound surname
+    or hyphenated syllables, e.g. Wang, Ouyang, Wei-Ming.
+    A token of concatenated syllables, e.g. Xiaoming, is only accepted when concatenated is True,
+    as many western given names can be split into pinyin too, e.g. Susan, Lisa, Tina.
+
+    :param name: str
+        The name to check
+    :param max_syllables: int
+        The max number of syllables of a hyphenated or concatenated token
+    :param concatenated: bool
+        Whether to accept a token of concatenated syllables without a pinyin surname
+    """
+    has_given_name = False
     for token in name.split():
-        if is_pinyin(token):
+        parts = _PINYIN_SEP_RE.split(token.strip('.,').lower())
+        splits = [split_pinyin(part) for part in parts]
+        if any(split is None for split in splits):
+            continue
+        syllables = sum(len(split) for split in splits)  # type: ignore
+        if syllables == 1 or parts[0] in COMPOUND_SURNAMES:
             return True
-    return False
+        if syllables <= max_syllables:
+            if len(parts) > 1:
+                return True
+            has_given_name = True
+    return concatenated and has_given_name
+
+
+def is_chinese_names(names: 'pd.Series', max_syllables=2, concatenated=False) -> 'pd.Series':
+    """
+    Check is_chinese_name for a Series of names, each distinct name is checked once
+
+    :param names: pd.Series
+        The names to check, missing values are not chinese names
+    :param max_syllables: int
+        The max number of syllables of a hyphenated or concatenated token
+    :param concatenated: bool
+        Whether to accept a token of concatenated syllables without a pinyin surname
+    """
+    import pandas as pd
+    import numpy as np
+    codes, uniques = pd.factorize(names.fillna('').astype(str))
+    flags = np.fromiter((is_chinese_name(name, max_syllables, concatenated) for name in uniques),
+                        dtype=bool, count=len(uniques))
+    return pd.Series(flags[codes], index=names.index, name=names.name)
 
 
 def is_pinyin(word: str):
-    # table of all valid pinyin without tone
-    pinyin = ['a', 'o', 'e', 'er', 'ai', 'ao', 'ou', 'an', 'en', 'ang', 'eng', 'yi', 'ya', 'yao', 'ye', 'you', 'yan', 'yin', 'yang', 'ying', 'yong', 'wu', 'wa', 'wo', 'wai', 'wei', 'wan', 'wen', 'wang', 'weng', 'yu', 'yue', 'yuan', 'yun', 'ba', 'bo', 'bai', 'bei', 'bao', 'ban', 'ben', 'bang', 'beng', 'bi', 'biao', 'bie', 'bian', 'bin', 'bing', 'bu', 'pa', 'po', 'pai', 'pei', 'pao', 'pou', 'pan', 'pen', 'pang', 'peng', 'pi', 'piao', 'pie', 'pian', 'pin', 'ping', 'pu', 'ma', 'mo', 'me', 'mai', 'mei', 'mao', 'mou', 'man', 'men', 'mang', 'meng', 'mi', 'miao', 'mie', 'miu', 'mian', 'min', 'ming', 'mu', 'fa', 'fo', 'fei', 'fou', 'fan', 'fen', 'fang', 'feng', 'fu', 'da', 'de', 'dai', 'dei', 'dao', 'dou', 'dan', 'den', 'dang', 'deng', 'dong', 'di', 'diao', 'die', 'diu', 'dian', 'ding', 'du', 'duo', 'dui', 'duan', 'dun', 'ta', 'te', 'tai', 'tei', 'tao', 'tou', 'tan', 'tang', 'teng', 'tong', 'ti', 'tiao', 'tie', 'tian', 'ting', 'tu', 'tuo', 'tui', 'tuan', 'tun', 'na', 'ne', 'nai', 'nei', 'nao', 'nou', 'nan', 'nen', 'nang', 'neng', 'nong', 'ni', 'niao', 'nie', 'niu', 'nian', 'nin', 'niang', 'ning', 'nu', 'nuo', 'nuan', 'nv', 'nve', 'la', 'le', 'lai', 'lei', 'lao', 'lou', 'lan', 'lang', 'leng', 'long', 'li', 'lia', 'liao', 'lie', 'liu', 'lian', 'lin', 'liang', 'ling', 'lu', 'luo', 'luan', 'lun', 'lv', 'lve', 'ga', 'ge', 'gai', 'gei', 'gao', 'gou', 'gan', 'gen', 'gang', 'geng', 'gong', 'gu', 'gua', 'guo', 'guai', 'gui', 'guan', 'gun', 'guang', 'ka', 'ke', 'kai', 'kei', 'kao', 'kou', 'kan', 'ken', 'kang', 'keng', 'kong', 'ku', 'kua', 'kuo', 'kuai', 'kui', 'kuan', 'kun', 'kuang', 'ha', 'he', 'hai', 'hei', 'hao', 'hou', 'han', 'hen', 'hang', 'heng', 'hong', 'hu', 'hua', 'huo', 'huai', 'hui', 'huan', 'hun', 'huang', 'za', 'ze', 'zi', 'zai', 'zei', 'zao', 'zou', 'zan', 'zen', 'zang', 'zeng', 'zong', 'zu', 'zuo', 'zui', 'zuan', 'zun', 'ca', 'ce', 'ci', 'cai', 'cao', 'cou', 'can', 'cen', 'cang', 'ceng', 'cong', 'cu', 'cuo', 'cui', 'cuan', 'cun', 'sa', 'se', 'si', 'sai', 'sao', 'sou', 'san', 'sen', 'sang', 'seng', 'song', 'su', 'suo', 'sui', 'suan', 'sun', 'zha', 'zhe', 'zhi', 'zhai', 'zhei', 'zhao', 'zhou', 'zhan', 'zhen', 'zhang', 'zheng', 'zhong', 'zhu', 'zhua', 'zhuo', 'zhuai', 'zhui', 'zhuan', 'zhun', 'zhuang', 'cha', 'che', 'chi', 'chai', 'chao', 'chou', 'chan', 'chen', 'chang', 'cheng', 'chong', 'chu', 'chua', 'chuo', 'chuai', 'chui', 'chuan', 'chun', 'chuang', 'sha', 'she', 'shi', 'shai', 'shei', 'shao', 'shou', 'shan', 'shen', 'shang', 'sheng', 'shu', 'shua', 'shuo', 'shuai', 'shui', 'shuan', 'shun', 'shuang', 're', 'ri', 'rao', 'rou', 'ran', 'ren', 'rang', 'reng', 'rong', 'ru', 'rua', 'ruo', 'rui', 'ruan', 'run', 'ji', 'jia', 'jiao', 'jie', 'jiu', 'jian', 'jin', 'jiang', 'jing', 'jiong', 'ju', 'jue', 'juan', 'jun', 'qi', 'qia', 'qiao', 'qie', 'qiu', 'qian', 'qin', 'qiang', 'qing', 'qiong', 'qu', 'que', 'quan', 'qun', 'xi', 'xia', 'xiao', 'xie', 'xiu', 'xian', 'xin', 'xiang', 'xing', 'xiong', 'xu', 'xue', 'xuan', 'xun']
-    return word.lower() in pinyin
+    return word.lower() in PINYIN
+
+
+@functools.lru_cache(maxsize=65536)
+def split_pinyin(word: str) -> Optional[Tuple[str, ...]]:
+    """
+    Split a word into pinyin syllables with the fewest syllables, e.g. xiaoming -> (xiao, ming)
+
+    A syllable starting with a, o or e must be the first one, as pinyin separates it with an apostrophe,
+    e.g. xi'an. Return None if the word is not pinyin.
+
+    :param word: str
+        The word to split
+    """
+    word = word.lower()
+    n = len(word)
+    if n == 0:
+        return None
+    # best[i] is the split of word[:i] with the fewest syllables
+    best: List[Optional[Tuple[str, ...]]] = [()] + [None] * n
+    for i in range(n):
+        prefix = best[i]
+        if prefix is None:
+            continue
+        for j in range(i + 1, min(n, i + _MAX_PINYIN_LEN) + 1):
+            syllable = word[i:j]
+            if i > 0 and syllable[0] in 'aoe':
+                break
+            if syllable in PINYIN and (best[j] is None or len(best[j]) > len(prefix) + 1):  # type: ignore
+                best[j] = prefix + (syllable,)
+    return best[n]
 
 
 def url_to_key(url: str, include_query=False, no_ext=False):
@@ -78,6 +173,78 @@ def expand_globs(patterns: Iterable[str], raise_invalid=False) -> List[str]:
     return paths
 
 
+def group_by_key(items: Iterable[T], key_fn: Callable[[T], Hashable]) -> List[List[T]]:
+    """
+    Group items by key, the order of groups and items in each group is preserved
+
+    :param items: iterable of items
+    :param key_fn: function to get the key of an item
+    :return: list of groups
+    """
+    groups: Dict[Hashable, List[T]] = {}
+    for item in items:
+        groups.setdefault(key_fn(item), []).append(item)
+    return list(groups.values())
+
+
+def is_up_to_date(in_file: str, out_file: str):
+    """
+    Check if out_file exists and is newer than in_file
+    """
+    if os.path.abspath(in_file) == os.path.abspath(out_file) or not os.path.exists(out_file):
+        return False
+    return os.path.getmtime(out_file) >= os.path.getmtime(in_file)
+
+
+def _timed_file_job(fn, job: Tuple[str, str]) -> Tuple[float, Optional[str]]:
+    start = time.perf_counter()
+    error = None
+    try:
+        fn(*job)
+    except Exception as e:
+        error = repr(e)
+    return time.perf_counter() - start, error
+
+
+def run_file_jobs(fn: Callable[[str, str], object], jobs: List[Tuple[str, str]], workers=1, chunksize=0):
+    """
+    Run fn(in_file, out_file) for each job and report timings
+
+    :param fn: function to process a file, must be picklable if workers > 1
+    :param jobs: list of (in_file, out_file)
+    :param workers: int
+        The number of processes, run in current process if workers <= 1
+    :param chunksize: int
+        The number of jobs sent to a process at once, default to split jobs into 4 chunks per worker
+    :return: list of failed jobs
+    """
+    logger = get_logger(__name__)
+    start = time.perf_counter()
+    timed_fn = functools.partial(_timed_file_job, fn)
+    failed = []
+
+    def _report(results):
+        for job, (elapsed, error) in zip(jobs, results):
+            if error is None:
+                logger.info(f'{job[0]} -> {job[1]} done in {elapsed:.3f}s')
+            else:
+                logger.error(f'{job[0]} -> {job[1]} failed in {elapsed:.3f}s: {error}')
+                failed.append(job)
+
+    if workers > 1 and len(jobs) > 1:
+        chunksize = chunksize or max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _report(pool.map(timed_fn, jobs, chunksize=chunksize))
+    else:
+        _report(map(timed_fn, jobs))
+
+    elapsed = time.perf_counter() - start
+    size_mb = sum(os.path.getsize(job[0]) for job in jobs if os.path.exists(job[0])) / 1024 / 1024
+    logger.info(f'{len(jobs)} files ({len(failed)} failed, {size_mb:.1f} MB) in {elapsed:.2f}s, '
+                f'{len(jobs) / max(elapsed, 1e-9):.1f} files/s, {size_mb / max(elapsed, 1e-9):.2f} MB/s')
+    return failed
+
+
 def get_md_code_block(md_text: str, start: str, end: str='```'):
     """
     Get the code block from markdown text by yieling the code block text
@@ -105,16 +272,32 @@ def get_md_code_block(md_text: str, start: str, end: str='```'):
 
 def jsonl_load(fp):
     for l in fp:
-        yield json.loads(l)
+        if l.strip():
+            yield jsonl.loads(l)
 
 
 def jsonl_dump(fp, data, ensure_ascii=False):
-    lines = [json.dumps(d, ensure_ascii=ensure_ascii) for d in data]
-    fp.write('\n'.join(lines))
+    # write line by line instead of joining all lines in memory
+    for i, d in enumerate(data):
+        if i > 0:
+            fp.write('\n')
+        fp.write(json.dumps(d, ensure_ascii=True) if ensure_ascii else jsonl.dumps(d).decode('utf-8'))
 
 
 def jsonl_loads(s):
-    return [json.loads(l) for l in s.strip().split('\n')]
+    # splitlines also splits at characters like U+2028 that can be in json strings
+    return list(jsonl_load(s.split('\n')))
+
+
+def write_text_atomic(path, text, encoding='utf-8'):
+    """
+    Write text to a temporary file then rename it to path,
+    so that a crash never leaves a half written file behind
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding=encoding) as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
 
 def json_load_file(path, encoding='utf-8'):
@@ -137,16 +320,143 @@ def ensure_dir(path):
         os.makedirs(d, exist_ok=True)
 
 
-def clean_html(markup, keep_attrs=False):
+CLEAN_HTML_DROP_TAGS = ['script', 'style', 'noscript', 'svg', 'img', 'iframe', 'code']
+
+
+def clean_html(markup, keep_attrs=False, parser='html.parser'):
+    """
+    Remove attributes and tags that are useless for reading the page
+
+    :param markup: str or file
+    :param keep_attrs: bool
+        Whether to keep the attributes of meta tags
+    :param parser: str
+        'html.parser' to clean with BeautifulSoup,
+        'lxml' to filter the stream of lxml parser events without building a tree, which is much faster
+    """
+    if parser == 'lxml':
+        return clean_html_lxml(markup, keep_attrs=keep_attrs)
+    return str(clean_soup(markup, keep_attrs=keep_attrs))
+
+
+def clean_html_file(in_file, out_file, keep_attrs=False, parser='html.parser'):
+    with open(in_file, 'r', encoding='utf-8') as f:
+        cleaned = clean_html(f, keep_attrs=keep_attrs, parser=parser)
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write(cleaned)
+
+
+def clean_soup(markup, keep_attrs=False) -> 'BeautifulSoup':
+    """
+    Parse html and remove attributes and tags that are useless for reading the page
+    """
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(markup, 'html.parser')
     for tag in soup():
         attrs = tag.attrs.copy() if tag.attrs else []
         if not keep_attrs or tag.name not in ['meta']:
             for attr in attrs:
                 del tag[attr]
-        if tag.name in ['script', 'style', 'noscript', 'svg', 'img', 'iframe', 'code']:
+        if tag.name in CLEAN_HTML_DROP_TAGS:
             tag.decompose()
-    return str(soup)
+    return soup
+
+
+# void elements that are serialized as <tag/> without end tag
+HTML_VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+
+class _CleanHtmlTarget:
+    """
+    lxml parser target that writes the cleaned html while the document is parsed
+    """
+
+    def __init__(self, keep_attrs=False):
+        self._keep_attrs = keep_attrs
+        self._drop_tags = set(CLEAN_HTML_DROP_TAGS)
+        self._out: List[str] = []
+        self._text: List[str] = []
+        self._skip_depth = 0
+        self._preserve_depth = 0
+
+    def doctype(self, name, pubid, system):
+        # BeautifulSoup puts a line break after doctype
+        if pubid:
+            self._out.append(f'<!DOCTYPE {name} PUBLIC "{pubid}" "{system}">\n')
+        elif system:
+            self._out.append(f'<!DOCTYPE {name} SYSTEM "{system}">\n')
+        else:
+            self._out.append(f'<!DOCTYPE {name}>\n')
+
+    def start(self, tag, attrib):
+        if self._skip_depth:
+            self._skip_depth += 1
+            return
+        # text before and after a dropped tag are separate strings as in BeautifulSoup
+        self._flush_text()
+        if tag in self._drop_tags:
+            self._skip_depth += 1
+            return
+        attrs = ''
+        if self._keep_attrs and tag == 'meta':
+            attrs = ''.join(f' {k}="{html.escape(v)}"' for k, v in sorted(attrib.items()))
+        self._out.append(f'<{tag}{attrs}/>' if tag in HTML_VOID_TAGS else f'<{tag}{attrs}>')
+        if tag in ('pre', 'textarea'):
+            self._preserve_depth += 1
+
+    def end(self, tag):
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        self._flush_text()
+        if tag not in HTML_VOID_TAGS:
+            self._out.append(f'</{tag}>')
+        if tag in ('pre', 'textarea'):
+            self._preserve_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._text.append(data)
+
+    def comment(self, text):
+        if not self._skip_depth:
+            self._flush_text()
+            self._out.append(f'<!--{text}-->')
+
+    def close(self):
+        self._flush_text()
+        return ''.join(self._out)
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        # BeautifulSoup collapses whitespace only strings outside of pre and textarea
+        if not self._preserve_depth and not text.strip():
+            text = '\n' if '\n' in text else ' '
+        self._out.append(html.escape(text, quote=False))
+
+
+def clean_html_lxml(markup, keep_attrs=False):
+    """
+    Clean html with the same rules as clean_soup, but in a single pass over lxml parser events
+
+    The output is not byte identical to clean_soup, as lxml fixes the document structure
+    (e.g. adds missing html and body tags), but the text and tags that remain are the same.
+    """
+    try:
+        from lxml import etree
+    except ImportError:
+        raise ImportError('lxml is required to clean html with parser=lxml, install it with `pip install lxml`')
+    if not isinstance(markup, (str, bytes)):
+        markup = markup.read()
+    parser = etree.HTMLParser(target=_CleanHtmlTarget(keep_attrs=keep_attrs), huge_tree=True)
+    parser.feed(markup)
+    return parser.close()
 
 
 def formal_filename(s):
@@ -1,2 +1,269 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+import hashlib
+import asyncio
+import weakref
+import random
+import json
+import re
 
+from .lib import get_logger
+from .cache import DiskCache, hash_key
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletion
+
+logger = get_logger(__name__)
+
+# event loop -> {(base_url, api_key): shared client}
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncOpenAI]]' = \
+    weakref.WeakKeyDictionary()
+
+
+# a rough approximation of BPE tokens: a CJK character, a word piece of up to 4 letters, or a symbol
+_TOKEN_RE = re.compile(r'[\u4e00-\u9fff]|[^\W\d_]{1,4}|\d{1,3}|[^\w\s]')
+_HEADING_RE = re.compile(r'^#{1,6}\s')
+_LIST_ITEM_RE = re.compile(r'^(?:[-*+]|\d+[.)])\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of text without a tokenizer
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def split_markdown(md_text: str, max_tokens: int) -> List[str]:
+    """
+    Split markdown into chunks of at most max_tokens estimated tokens
+
+    Chunks are split at headings, top level list items and blank lines,
+    a block that is still too large is split by lines.
+    The nearest heading is repeated at the start of a chunk to keep the context.
+
+    :param md_text: str
+        The markdown text
+    :param max_tokens: int
+        The max tokens of a chunk
+    """
+    if estimate_tokens(md_text) <= max_tokens:
+        return [md_text]
+
+    # split into blocks at boundaries, with the separator before each block
+    blocks: List[Tuple[str, str]] = []
+    lines: List[str] = []
+    sep = ''
+    blank = False
+    for line in md_text.split('\n'):
+        if lines and (not line.strip() or _HEADING_RE.match(line) or _LIST_ITEM_RE.match(line)):
+            blocks.append((sep, '\n'.join(lines)))
+            lines = []
+        if line.strip():
+            if not lines:
+                sep = '\n\n' if blank else '\n'
+            lines.append(line)
+            blank = False
+        else:
+            blank = True
+    if lines:
+        blocks.append((sep, '\n'.join(lines)))
+
+    chunks: List[str] = []
+    chunk = ''
+    chunk_tokens = 0
+    heading = ''
+    for sep, block in blocks:
+        # the heading repeated before the pieces of block is counted in the budget of pieces,
+        # a heading that takes more than half of a chunk is not repeated
+        context = block.split('\n', 1)[0] if _HEADING_RE.match(block) else heading
+        context_tokens = estimate_tokens(context)
+        if context_tokens * 2 > max_tokens:
+            context_tokens = 0
+        for piece in _split_block(block, max_tokens - context_tokens):
+            tokens = estimate_tokens(piece)
+            if chunk and chunk_tokens + tokens > max_tokens:
+                chunks.append(chunk)
+                chunk, chunk_tokens = '', 0
+                if context_tokens and heading and not _HEADING_RE.match(piece):
+                    chunk, chunk_tokens = heading, context_tokens
+                    sep = '\n\n'
+            chunk = chunk + sep + piece if chunk else piece
+            chunk_tokens += tokens
+            sep = '\n'
+            if _HEADING_RE.match(piece):
+                heading = piece.split('\n', 1)[0]
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _split_block(block: str, max_tokens: int) -> List[str]:
+    if estimate_tokens(block) <= max_tokens:
+        return [block]
+    pieces: List[str] = []
+    for line in block.split('\n'):
+        while estimate_tokens(line) > max_tokens:
+            # a single line that is too long, cut it by characters
+            cut = max(1, len(line) * max_tokens // estimate_tokens(line))
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if line:
+            pieces.append(line)
+    return pieces
+
+
+def prompt_sha(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def get_retry_errors():
+    """
+    Get the errors that are worth to retry, 429 and transient server or network errors
+    """
+    # openai is slow to import, import it when it is needed
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def get_openai_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> 'AsyncOpenAI':
+    """
+    Get a shared AsyncOpenAI client for base_url and api_key
+
+    The client and its connection pool are reused by every caller in the same event loop,
+    so keep-alive connections are not set up again for each runner.
+    Retry is disabled in the client as it is handled by LlmRunner.
+    The clients are closed when their event loop is shut down by asyncio.run.
+
+    :param base_url: str
+        The base url of the api
+    :param api_key: str
+        The api key
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = {}
+        loop.create_task(_close_clients_on_exit(loop, clients))
+    client = clients.get((base_url, api_key))
+    if client is None:
+        from openai import AsyncOpenAI
+        client = clients[(base_url, api_key)] = AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+    return client
+
+
+async def _close_clients_on_exit(loop: asyncio.AbstractEventLoop, clients: Dict[tuple, 'AsyncOpenAI']):
+    """
+    Close the clients of an event loop when it is shut down
+
+    asyncio.run cancels the pending tasks before it closes the loop,
+    so the connection pools are closed while the loop is still running.
+    """
+    try:
+        await loop.create_future()
+    finally:
+        for client in clients.values():
+            await client.close()
+        clients.clear()
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    """
+    Get the seconds to wait from the Retry-After header of a failed response
+    """
+    response = getattr(e, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after', ''))
+    except ValueError:
+        return None
+
+
+class LlmRunner:
+
+    def __init__(self, client: 'AsyncOpenAI',
+                 model='deepseek-chat',
+                 max_tokens=4096 * 2,
+                 concurrency=4,
+                 max_retries=5,
+                 backoff=1.,
+                 max_backoff=60.,
+                 log_file=None,
+                 cache: Optional[DiskCache] = None):
+        """
+        Run chat completion requests with bounded concurrency,
+        retry with exponential backoff on rate limit and transient errors
+
+        :param client: AsyncOpenAI
+        :param concurrency: int
+            The max number of requests in flight
+        :param max_retries: int
+            The max number of retries of a request
+        :param backoff: float
+            The initial delay in seconds before retry, doubled after each retry
+        :param log_file: str
+            The jsonl file to log responses
+        :param cache: DiskCache
+            The cache of responses keyed by model, prompt, text and max_tokens
+        """
+        self._client = client
+        self._model = model
+        self._max_tokens = max_tokens
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._log_file = log_file
+        self._cache = cache
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def chat(self, prompt: str, text: str) -> 'ChatCompletion':
+        from openai.types.chat import ChatCompletion
+        key = ''
+        if self._cache is not None:
+            key = hash_key(self._model, prompt, text, self._max_tokens)
+            entry = self._cache.get(key)
+            if entry is not None:
+                return ChatCompletion.model_validate(entry['response'])
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        async with self._semaphore:
+            res = await self._chat_with_retry(prompt, text)
+        if self._log_file:
+            with open(self._log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(res.model_dump()))
+                f.write('\n')
+        if self._cache is not None:
+            self._cache.set(key, {
+                'model': self._model,
+                'prompt_sha': prompt_sha(prompt),
+                'max_tokens': self._max_tokens,
+                'response': res.model_dump(),
+            })
+        return res
+
+    async def _chat_with_retry(self, prompt: str, text: str):
+        messages = [
+            {'role': 'system', 'content': prompt},
+            {'role': 'user', 'content': text},
+        ]
+        retry_errors = get_retry_errors()
+        for i in range(self._max_retries + 1):
+            try:
+                return await self._client.chat.completions.create(
+                    model=self._model,
+                    messages=messages,  # type: ignore
+                    stream=False,
+                    max_tokens=self._max_tokens,
+                )
+            except retry_errors as e:
+                if i >= self._max_retries:
+                    raise
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = min(self._max_backoff, self._backoff * 2 ** i) * random.uniform(0.5, 1.)
+                logger.warning('llm request failed with %s, retry in %.1fs', type(e).__name__, delay)
+                await asyncio.sleep(delay)
+        raise RuntimeError('unreachable')
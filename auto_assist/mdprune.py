@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Tuple
+
+import re
+
+
+# link text of navigation menus, a run of link only list items is dropped
+# if most of them are one of these words
+NAV_WORDS = {
+    'home', 'about', 'about us', 'contact', 'contact us', 'news', 'events', 'research', 'people',
+    'faculty', 'staff', 'students', 'alumni', 'publications', 'teaching', 'courses', 'education',
+    'admissions', 'apply', 'giving', 'give', 'donate', 'support', 'login', 'log in', 'sign in',
+    'search', 'menu', 'directory', 'resources', 'facilities', 'seminars', 'calendar', 'jobs',
+    'careers', 'positions', 'openings', 'join us', 'links', 'gallery', 'photos', 'blog',
+    'undergraduate', 'graduate', 'programs', 'department', 'departments', 'overview', 'history',
+    'sitemap', 'site map', 'library', 'libraries', 'back', 'back to top', 'top', 'more', 'next', 'previous',
+    'facebook', 'twitter', 'x', 'linkedin', 'instagram', 'youtube', 'wechat', 'weibo', 'rss',
+}
+
+# short lines of page footer and accessibility helpers,
+# only dropped in the first and last lines of a page or if they are mostly links
+BOILERPLATE_MAX_LEN = 150
+BOILERPLATE_EDGE_LINES = 10
+BOILERPLATE_RE = re.compile(
+    r'(©|&copy;|\(c\)\s*\d{4}|copyright|all rights reserved|privacy (policy|statement|notice)|'
+    r'terms of (use|service)|cookie|accessibility|skip to (main )?content|'
+    r'report a (web|site) (issue|problem)|sitemap)',
+    re.IGNORECASE)
+
+_MD_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_LINK_ONLY_ITEM_RE = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+\[([^\]]*)\]\([^)]*\)\s*$')
+_IMAGE_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_ATTR_RE = re.compile(r'\{[#.][^}\n]*\}')
+_FENCED_DIV_RE = re.compile(r'^\s*:::.*$')
+_RAW_TAG_RE = re.compile(r'</?(?:div|span|section|article|nav|header|footer|main|aside)\b[^>]*>', re.IGNORECASE)
+_LINK_RE = re.compile(r'\]\(([^)\s]+)((?:\s+"[^"]*")?)\)')
+_AUTOLINK_RE = re.compile(r'<((?:https?|mailto):[^>\s]+)>')
+_PLACEHOLDER_RE = re.compile(r'\bu:\d+\b')
+_SPACES_RE = re.compile(r'[ \t]{2,}')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def prune_markdown(md_text: str, max_url_len=40) -> Tuple[str, Dict[str, str]]:
+    """
+    Reduce the tokens of markdown before sending it to LLM
+
+    Navigation menus, footer lines, images and pandoc attributes are removed,
+    whitespace is collapsed and long urls are replaced with placeholders like u:1,
+    which can be restored with restore_urls after extraction.
+
+    :param md_text: str
+        The markdown text
+    :param max_url_len: int
+        Urls longer than this are replaced with placeholders
+    :return: (pruned markdown, placeholder -> url)
+    """
+    url_map: Dict[str, str] = {}
+    url_ids: Dict[str, str] = {}
+
+    def _shorten(url: str) -> str:
+        if len(url) <= max_url_len:
+            return url
+        if url not in url_ids:
+            placeholder = f'u:{len(url_ids) + 1}'
+            url_ids[url] = placeholder
+            url_map[placeholder] = url
+        return url_ids[url]
+
+    lines = _drop_nav_runs(md_text.split('\n'))
+    # the number of non blank lines before each line
+    positions: List[int] = []
+    n_text = 0
+    for line in lines:
+        positions.append(n_text)
+        if line.strip():
+            n_text += 1
+
+    out: List[str] = []
+    in_code = False
+    for line, pos in zip(lines, positions):
+        if line.lstrip().startswith('```'):
+            in_code = not in_code
+            out.append(line)
+            continue
+        if in_code:
+            out.append(line)
+            continue
+        if _FENCED_DIV_RE.match(line):
+            continue
+        if len(line) <= BOILERPLATE_MAX_LEN and BOILERPLATE_RE.search(line) and (
+                pos < BOILERPLATE_EDGE_LINES or pos >= n_text - BOILERPLATE_EDGE_LINES or _is_link_line(line)):
+            continue
+        line = _IMAGE_RE.sub('', line)
+        line = _ATTR_RE.sub('', line)
+        line = _RAW_TAG_RE.sub('', line)
+        line = _LINK_RE.sub(lambda m: f']({_shorten(m.group(1))}{m.group(2)})', line)
+        line = _AUTOLINK_RE.sub(lambda m: f'<{_shorten(m.group(1))}>', line)
+        indent = len(line) - len(line.lstrip())
+        line = line[:indent] + _SPACES_RE.sub(' ', line[indent:]).rstrip()
+        if line.strip() in ('[]()', '-', '*'):
+            continue
+        out.append(line)
+
+    text = _BLANK_LINES_RE.sub('\n\n', '\n'.join(out)).strip() + '\n'
+    return text, url_map
+
+
+def restore_urls(obj: Any, url_map: Dict[str, str]) -> Any:
+    """
+    Replace url placeholders in strings of obj with the original urls
+    """
+    if not url_map:
+        return obj
+    if isinstance(obj, str):
+        return _PLACEHOLDER_RE.sub(lambda m: url_map.get(m.group(0), m.group(0)), obj)
+    if isinstance(obj, list):
+        return [restore_urls(v, url_map) for v in obj]
+    if isinstance(obj, dict):
+        return {k: restore_urls(v, url_map) for k, v in obj.items()}
+    return obj
+
+
+def _is_link_line(line: str) -> bool:
+    """
+    Check if most of the text of a line is links, e.g. a footer like [Privacy](/privacy) | [Sitemap](/sitemap)
+    """
+    text = _MD_LINK_RE.sub('', line).strip(' \t-*+|·•')
+    link_text = ''.join(_MD_LINK_RE.findall(line))
+    return bool(link_text) and len(text) <= len(link_text)
+
+
+def _drop_nav_runs(lines: List[str], min_run=3) -> List[str]:
+    """
+    Drop runs of link only list items that look like a navigation menu
+    """
+    out: List[str] = []
+    run: List[str] = []
+
+    def _flush():
+        items = [line for line in run if line.strip()]
+        texts = [_LINK_ONLY_ITEM_RE.match(line).group(1).strip().lower() for line in items]  # type: ignore
+        nav = sum(1 for t in texts if t in NAV_WORDS)
+        if len(items) < min_run or nav * 2 < len(items):
+            out.extend(run)
+        run.clear()
+
+    for line in lines:
+        if _LINK_ONLY_ITEM_RE.match(line):
+            run.append(line)
+        elif run and not line.strip():
+            run.append(line)
+        else:
+            if run:
+                _flush()
+            out.append(line)
+    if run:
+        _flush()
+    return out
@@ -0,0 +1,161 @@
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import hashlib
+import json
+import time
+import os
+
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+# query parameters that don't change the content of a page
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', '_ga')
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize url so that the same page has the same cache key
+
+    Scheme and host are lower cased, default ports, fragments and tracking parameters are removed,
+    and query parameters are sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and not ((scheme, parts.port) in (('http', 80), ('https', 443))):
+        host += f':{parts.port}'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(TRACKING_PARAMS))
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize search query so that the same search has the same cache key,
+    search engines ignore case and extra whitespace
+    """
+    return ' '.join(query.lower().split())
+
+
+class PageCache:
+
+    def __init__(self, cache_dir: str, ttl=7 * 24 * 3600.):
+        """
+        Cache of raw pages shared by all output directories
+
+        The content of a page is stored once as <cache_dir>/blobs/<sha[:2]>/<sha>.html,
+        urls/<key[:2]>/<key>.json maps a normalized url to its content, fetch time and validators
+        (ETag and Last-Modified) that are used to revalidate the page after ttl.
+
+        :param cache_dir: str
+            The directory to store pages
+        :param ttl: float
+            The seconds that a page is fresh and used without revalidation
+        """
+        self._cache_dir = os.path.expanduser(cache_dir)
+        self._ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the entry of url, or None if the page is not cached
+        """
+        path = self._url_path(url)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self.blob_path(entry)):
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['fetched_at'] < self._ttl
+
+    def read(self, entry: Dict[str, Any]) -> str:
+        with open(self.blob_path(entry), 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, Any]:
+        data = text.encode('utf-8')
+        sha = hashlib.sha256(data).hexdigest()
+        entry = {
+            'url': normalize_url(url),
+            'sha256': sha,
+            'etag': etag or '',
+            'last_modified': last_modified or '',
+            'fetched_at': time.time(),
+        }
+        blob_path = self.blob_path(entry)
+        if not os.path.exists(blob_path):
+            _write_atomic(blob_path, data)
+        self._save(entry)
+        return entry
+
+    def touch(self, entry: Dict[str, Any]):
+        """
+        Mark the entry as fresh after it is revalidated
+        """
+        entry['fetched_at'] = time.time()
+        self._save(entry)
+
+    def blob_path(self, entry: Dict[str, Any]) -> str:
+        sha = entry['sha256']
+        return os.path.join(self._cache_dir, 'blobs', sha[:2], sha + '.html')
+
+    def prune(self, max_age: float) -> int:
+        """
+        Remove entries fetched more than max_age seconds ago and pages no longer referenced
+
+        :return: the number of removed entries
+        """
+        removed = 0
+        shas = set()
+        for path in _scan(os.path.join(self._cache_dir, 'urls'), '.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except json.JSONDecodeError:
+                entry = None
+            if entry is None or time.time() - entry['fetched_at'] > max_age:
+                os.remove(path)
+                removed += 1
+            else:
+                shas.add(entry['sha256'])
+        for path in _scan(os.path.join(self._cache_dir, 'blobs'), '.html'):
+            if os.path.basename(path)[:-len('.html')] not in shas:
+                os.remove(path)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
+
+    def _url_path(self, url: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, 'urls', key[:2], key + '.json')
+
+    def _save(self, entry: Dict[str, Any]):
+        _write_atomic(self._url_path(entry['url']), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _scan(root: str, suffix: str):
+    if not os.path.isdir(root):
+        return
+    for sub in os.scandir(root):
+        if sub.is_dir():
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(suffix):
+                    yield entry.path
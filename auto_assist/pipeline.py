@@ -0,0 +1,94 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncio
+import time
+
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Stage:
+
+    def __init__(self, name: str, fn: Callable[[Any], Awaitable[Any]], concurrency: int, queue_size: int):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.tasks: List[asyncio.Task] = []
+        self.done = 0
+        self.failed = 0
+        self.busy = 0.
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues, each stage has its own workers
+
+    An item put into the pipeline goes through the stages in order,
+    the output of a stage is the input of the next one, a stage returns None to drop the item.
+    A full queue blocks the stage before it, so a slow stage slows down the whole pipeline
+    instead of piling up items in memory.
+    An item that fails in a stage is logged and dropped, the other items go on.
+    """
+
+    def __init__(self):
+        self._stages: List[_Stage] = []
+
+    def add_stage(self, name: str, fn: Callable[[Any], Awaitable[Any]], concurrency=1, queue_size=16):
+        """
+        :param name: str
+            The name of stage used in logs
+        :param fn: async function that accept an item and return the item for next stage
+        :param concurrency: int
+            The number of workers of the stage
+        :param queue_size: int
+            The max number of items waiting for the stage
+        """
+        self._stages.append(_Stage(name, fn, concurrency, queue_size))
+        return self
+
+    async def put(self, item: Any):
+        """
+        Put an item into the first stage, wait if the stage is full
+        """
+        await self._stages[0].queue.put(item)
+
+    async def __aenter__(self):
+        for i, stage in enumerate(self._stages):
+            next_stage = self._stages[i + 1] if i + 1 < len(self._stages) else None
+            stage.tasks = [asyncio.ensure_future(self._worker(stage, next_stage)) for _ in range(stage.concurrency)]
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                # items are passed to next stage before they are marked done, so join stages in order
+                for stage in self._stages:
+                    await stage.queue.join()
+        finally:
+            tasks = [task for stage in self._stages for task in stage.tasks]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {stage.name: {'done': stage.done, 'failed': stage.failed, 'busy': round(stage.busy, 2)}
+                for stage in self._stages}
+
+    async def _worker(self, stage: _Stage, next_stage: Optional[_Stage]):
+        while True:
+            item = await stage.queue.get()
+            start = time.monotonic()
+            try:
+                out = await stage.fn(item)
+                stage.done += 1
+                stage.busy += time.monotonic() - start
+                if out is not None and next_stage is not None:
+                    await next_stage.queue.put(out)
+            except Exception:
+                stage.failed += 1
+                stage.busy += time.monotonic() - start
+                logger.exception(f'fail in stage {stage.name}')
+            finally:
+                stage.queue.task_done()
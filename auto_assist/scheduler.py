@@ -0,0 +1,127 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import asyncio
+import time
+
+from .lib import get_logger
+
+logger = get_logger(__name__)
+
+# signals of responses reported to scheduler
+OK = 'ok'
+THROTTLED = 'throttled'  # 429, 503 or captcha page
+CHALLENGE = 'challenge'  # cloudflare or other bot challenge page
+
+
+class _HostState:
+
+    def __init__(self, max_concurrency: int, rate: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate = rate
+        self.tat = 0.  # the theoretical arrival time of next request
+        self.penalty_until = 0.
+        self.strikes = 0
+        self.requests = 0
+        self.throttled = 0
+
+
+class HostScheduler:
+
+    def __init__(self, max_concurrency=1, rate=0., burst=1,
+                 min_rate=0.05, recover_rate=2., rate_step=0.05,
+                 penalty=5., max_penalty=300.):
+        """
+        Pace requests to each host with a token bucket shared by all pages,
+        the rate of a host is halved and the host is paused when it throttles us,
+        and increased step by step after successful requests.
+
+        :param max_concurrency: int
+            The max number of concurrent requests to a host
+        :param rate: float
+            The max requests per second to a host, 0 means unlimited until the host throttles us
+        :param burst: int
+            The number of requests that can be sent at once before pacing by rate
+        :param min_rate: float
+            The min requests per second after backoff
+        :param recover_rate: float
+            The rate to back to unlimited when rate is 0
+        :param rate_step: float
+            The requests per second added to rate after a successful request
+        :param penalty: float
+            The seconds to pause a host after it throttles us, doubled on each consecutive throttle
+        :param max_penalty: float
+            The max seconds to pause a host
+        """
+        self._max_concurrency = max_concurrency
+        self._rate = rate
+        self._burst = burst
+        self._min_rate = min_rate
+        self._recover_rate = recover_rate
+        self._rate_step = rate_step
+        self._penalty = penalty
+        self._max_penalty = max_penalty
+        self._hosts: Dict[str, _HostState] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Wait for the turn of a request to the host of url
+        """
+        state = self._get_state(url)
+        async with state.semaphore:
+            now = time.monotonic()
+            interval = 1. / state.rate if state.rate > 0 else 0.
+            start = max(now, state.penalty_until, state.tat - (self._burst - 1) * interval)
+            state.tat = max(state.tat, start) + interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            state.requests += 1
+            yield
+
+    def report(self, url: str, signal: str, retry_after: Optional[float] = None):
+        """
+        Report the result of a request to adapt the rate of the host
+
+        :param signal: str
+            OK, THROTTLED or CHALLENGE
+        :param retry_after: float
+            The seconds to wait told by the host
+        """
+        state = self._get_state(url)
+        if signal == OK:
+            state.strikes = 0
+            if state.rate > 0 and (self._rate == 0 or state.rate < self._rate):
+                state.rate += self._rate_step
+                if self._rate == 0 and state.rate >= self._recover_rate:
+                    state.rate = 0.
+                elif self._rate > 0:
+                    state.rate = min(state.rate, self._rate)
+            return
+
+        state.strikes += 1
+        state.throttled += 1
+        current = state.rate if state.rate > 0 else self._recover_rate
+        state.rate = max(self._min_rate, current / 2)
+        pause = min(self._max_penalty, self._penalty * 2 ** (state.strikes - 1))
+        if retry_after is not None:
+            pause = max(pause, min(retry_after, self._max_penalty))
+        state.penalty_until = max(state.penalty_until, time.monotonic() + pause)
+        logger.warning(f'{urlparse(url).netloc} {signal}, pause {pause:.0f}s and slow down to {state.rate:.2f} req/s')
+
+    def is_paused(self, url: str) -> bool:
+        """
+        Check if the host of url is paused after it throttles us
+        """
+        return self._get_state(url).penalty_until > time.monotonic()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: {'requests': s.requests, 'throttled': s.throttled, 'rate': s.rate}
+                for host, s in self._hosts.items() if s.throttled}
+
+    def _get_state(self, url: str) -> _HostState:
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self._max_concurrency, self._rate)
+        return self._hosts[host]
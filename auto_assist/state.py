@@ -0,0 +1,119 @@
+from typing import Dict, List, NamedTuple, Optional
+
+import sqlite3
+import time
+import os
+
+# stages of a crawl job in order
+STAGES = ('scraped', 'cleaned', 'converted', 'parsed')
+
+
+class Job(NamedTuple):
+    key: str
+    url: str
+    stage: str
+    errors: int
+    last_error: str
+    updated_at: float
+
+
+class JobStore:
+
+    def __init__(self, db_file: str, max_errors=3):
+        """
+        Track the stage of crawl jobs in a SQLite database
+
+        All jobs are loaded into memory when the store is opened,
+        so checking if a job is done doesn't touch the disk.
+
+        :param db_file: str
+            The SQLite database file
+        :param max_errors: int
+            Jobs that failed this many times are not retried
+        """
+        self._db_file = db_file
+        self._max_errors = max_errors
+        self._conn = sqlite3.connect(db_file, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL DEFAULT '',
+                stage TEXT NOT NULL DEFAULT '',
+                errors INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL
+            )''')
+        self._jobs: Dict[str, Job] = {
+            row[0]: Job(*row) for row in self._conn.execute(
+                'SELECT key, url, stage, errors, last_error, updated_at FROM jobs')
+        }
+
+    def get(self, key: str) -> Optional[Job]:
+        return self._jobs.get(key)
+
+    def is_done(self, key: str, stage: str, path: Optional[str] = None) -> bool:
+        """
+        Check if a job has reached the stage
+
+        :param path: str
+            The output file of the stage, if the job is unknown but the file exists,
+            e.g. output of previous runs without job store, the job is marked as done
+        """
+        job = self._jobs.get(key)
+        if job is not None and job.stage:
+            return STAGES.index(job.stage) >= STAGES.index(stage)
+        if path is not None and os.path.exists(path):
+            self.mark(key, stage)
+            return True
+        return False
+
+    def is_failed(self, key: str) -> bool:
+        """
+        Check if a job has failed too many times to retry
+        """
+        job = self._jobs.get(key)
+        return job is not None and job.errors >= self._max_errors
+
+    def mark(self, key: str, stage: str, url: Optional[str] = None):
+        """
+        Mark a job has reached the stage, the stage never goes backward
+        """
+        job = self._jobs.get(key)
+        if job is not None and job.stage and STAGES.index(job.stage) > STAGES.index(stage):
+            stage = job.stage
+        self._save(Job(
+            key=key,
+            url=url if url is not None else (job.url if job else ''),
+            stage=stage,
+            errors=job.errors if job else 0,
+            last_error=job.last_error if job else '',
+            updated_at=time.time(),
+        ))
+
+    def fail(self, key: str, error, url: Optional[str] = None):
+        """
+        Record an error of a job
+        """
+        job = self._jobs.get(key)
+        self._save(Job(
+            key=key,
+            url=url if url is not None else (job.url if job else ''),
+            stage=job.stage if job else '',
+            errors=(job.errors if job else 0) + 1,
+            last_error=repr(error),
+            updated_at=time.time(),
+        ))
+
+    def jobs(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def close(self):
+        self._conn.close()
+
+    def _save(self, job: Job):
+        self._jobs[job.key] = job
+        self._conn.execute(
+            'INSERT OR REPLACE INTO jobs (key, url, stage, errors, last_error, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            job)
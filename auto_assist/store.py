@@ -0,0 +1,177 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import sqlite3
+import time
+import os
+
+from .lib import get_logger
+from . import jsonl
+
+logger = get_logger(__name__)
+
+
+class JsonlStore:
+
+    def __init__(self, jsonl_file: str, key_fn: Callable[[Dict[str, Any]], str],
+                 batch_size=100, fsync_interval=5.):
+        """
+        A keyed store of records in a jsonl file
+
+        The jsonl file stays the source of truth and can be read by other tools,
+        a SQLite sidecar <jsonl_file>.idx maps the key of each record to its offset in the file,
+        so that lookups don't need to load the whole file and a large file opens instantly.
+        Records appended by other tools are indexed when the store is opened.
+        A None key is stored as an empty string, so that it can be looked up like other keys.
+
+        :param jsonl_file: str
+            The jsonl file of records
+        :param key_fn: function
+            Get the key of a record
+        :param batch_size: int
+            The number of records to buffer before writing to file
+        :param fsync_interval: float
+            The min interval in seconds between fsync of the file
+        """
+        self._jsonl_file = jsonl_file
+        self._key_fn = key_fn
+        self._batch_size = batch_size
+        self._fsync_interval = fsync_interval
+        self._last_fsync = time.time()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+        self._conn = sqlite3.connect(jsonl_file + '.idx')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS idx (key TEXT PRIMARY KEY, offset INTEGER, length INTEGER)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+        self._conn.commit()
+        if not os.path.exists(jsonl_file):
+            open(jsonl_file, 'a').close()
+        self._fp = open(jsonl_file, 'r+b')
+        self._sync_index()
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        key = _normalize_key(key)
+        if key in self._pending:
+            return True
+        return self._conn.execute('SELECT 1 FROM idx WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._conn.execute('SELECT COUNT(*) FROM idx').fetchone()[0]
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = _normalize_key(key)
+        if key in self._pending:
+            return self._pending[key]
+        row = self._conn.execute('SELECT offset, length FROM idx WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._fp.seek(row[0])
+        return jsonl.loads(self._fp.read(row[1]))
+
+    def add(self, record: Dict[str, Any]):
+        """
+        Add a record, the record is written to file when the batch is full or on flush
+        """
+        self._pending[_normalize_key(self._key_fn(record))] = record
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def keys(self) -> Iterator[str]:
+        self.flush()
+        for (key,) in self._conn.execute('SELECT key FROM idx ORDER BY offset'):
+            yield key
+
+    def flush(self, fsync=False):
+        """
+        Write pending records to file and index them
+
+        :param fsync: bool
+            Force fsync, otherwise fsync at most once per fsync_interval
+        """
+        if not self._pending:
+            return
+        self._fp.seek(0, os.SEEK_END)
+        offset = self._fp.tell()
+        rows: List[Tuple[str, int, int]] = []
+        chunks: List[bytes] = []
+        for key, record in self._pending.items():
+            data = jsonl.dumps(record)
+            rows.append((key, offset, len(data)))
+            chunks.append(data + b'\n')
+            offset += len(data) + 1
+        self._fp.write(b''.join(chunks))
+        self._fp.flush()
+        if fsync or time.time() - self._last_fsync >= self._fsync_interval:
+            os.fsync(self._fp.fileno())
+            self._last_fsync = time.time()
+        # the index is updated after the records are written,
+        # so records of a crash in between are indexed again on next open
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO idx (key, offset, length) VALUES (?, ?, ?)', rows)
+            self._set_indexed_size(offset)
+        self._pending.clear()
+
+    def close(self):
+        self.flush(fsync=True)
+        self._fp.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_indexed_size(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()
+        return row[0] if row else 0
+
+    def _set_indexed_size(self, size: int):
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('size', ?)", (size,))
+
+    def _sync_index(self):
+        """
+        Index records that are appended to the file since last time
+        """
+        size = os.path.getsize(self._jsonl_file)
+        start = self._get_indexed_size()
+        if start > size:
+            logger.warning(f'{self._jsonl_file} is shorter than its index, rebuild index')
+            start = 0
+            with self._conn:
+                self._conn.execute('DELETE FROM idx')
+        if start == size:
+            return
+
+        self._fp.seek(start)
+        offset = start
+        rows: List[Tuple[str, int, int]] = []
+        for line in self._fp:
+            data = line.rstrip(b'\r\n')
+            if not line.endswith(b'\n'):
+                # the last line without newline, e.g. written by jsonl_dump, or a partial line of an interrupted write
+                try:
+                    record = jsonl.loads(data) if data.strip() else None
+                except ValueError:
+                    logger.warning(f'drop incomplete record at offset {offset} of {self._jsonl_file}')
+                    self._fp.truncate(offset)
+                    break
+                if record is not None:
+                    rows.append((_normalize_key(self._key_fn(record)), offset, len(data)))
+                # end the line so that records can be appended
+                self._fp.seek(0, os.SEEK_END)
+                self._fp.write(b'\n')
+                self._fp.flush()
+                offset += len(line) + 1
+                break
+            if data.strip():
+                rows.append((_normalize_key(self._key_fn(jsonl.loads(data))), offset, len(data)))
+            offset += len(line)
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO idx (key, offset, length) VALUES (?, ?, ?)', rows)
+            self._set_indexed_size(offset)
+        logger.info(f'index {len(rows)} records of {self._jsonl_file}')
+
+
+def _normalize_key(key: Optional[str]) -> str:
+    return '' if key is None else key
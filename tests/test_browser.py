@@ -0,0 +1,86 @@
+from unittest import TestCase
+
+import asyncio
+
+from auto_assist.browser import get_ready_strategy, ReadyStats, BlockPolicy, BrowserPool
+
+
+class TestReadiness(TestCase):
+
+    def test_get_ready_strategy(self):
+        domains = {'linkedin.com': 'networkidle'}
+        self.assertEqual(get_ready_strategy('https://www.linkedin.com/in/x', 'dom_quiet', domains), 'networkidle')
+        self.assertEqual(get_ready_strategy('https://notlinkedin.com/', 'dom_quiet', domains), 'dom_quiet')
+
+    def test_ready_stats(self):
+        stats = ReadyStats()
+        for i in range(10):
+            stats.add('dom_quiet', i / 10, ready=i < 9)
+        self.assertEqual(stats.summary(), {'dom_quiet': {'pages': 10, 'mean': 0.45, 'p50': 0.5, 'p90': 0.9}})
+        self.assertEqual(stats.timeouts, 1)
+
+
+class TestBlockPolicy(TestCase):
+
+    def test_get_block_reason(self):
+        policy = BlockPolicy()
+        self.assertEqual(policy.get_block_reason('image', 'https://a.edu/x.png?v=1'), 'image')
+        self.assertEqual(policy.get_block_reason('script', 'https://www.googletagmanager.com/gtm.js'), 'domain')
+        self.assertIsNone(policy.get_block_reason('script', 'https://a.edu/app.js'))
+        self.assertIsNone(policy.get_block_reason('document', 'https://a.edu/people'))
+
+
+class FakePage:
+
+    def __init__(self):
+        self.closed = False
+
+    def on(self, event, fn):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.pages = []
+
+    def on(self, event, fn):
+        pass
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+class TestBrowserPool(TestCase):
+
+    def test_retry_row(self):
+        async def _launcher(pw):
+            return FakeContext()
+
+        async def _run():
+            pool = BrowserPool(_launcher, size=2)
+            await pool._launch()
+            tries = {}
+
+            async def _handler(item, page):
+                tries[item] = tries.get(item, 0) + 1
+                if item == 'flaky' and tries[item] < 2:
+                    page.closed = True  # the page crashed
+                    raise RuntimeError('crash')
+                if item == 'bad':
+                    raise RuntimeError('bad page')
+            failed = await pool.run([['a', 'flaky'], ['bad'], ['b']], _handler, max_tries=3, delay=0)
+            return failed, tries, pool.stats()
+
+        failed, tries, stats = asyncio.run(_run())
+        self.assertEqual(failed, ['bad'])
+        self.assertEqual(tries, {'a': 1, 'flaky': 2, 'bad': 3, 'b': 1})
+        self.assertEqual(stats, {'recycled_pages': 1, 'relaunches': 0})
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+import tempfile
+import time
+import os
+
+from auto_assist.cache import DiskCache, hash_key
+
+
+class TestDiskCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_set(self):
+        cache = DiskCache(self.cache_dir)
+        key = hash_key('model', 'prompt', 'text', 1024)
+        self.assertIsNone(cache.get(key))
+        cache.set(key, {'value': 1})
+        self.assertEqual(cache.get(key), {'value': 1})
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'stale': 0})
+        # an expired entry is a miss
+        self.assertIsNone(cache.get(key, is_fresh=lambda entry: entry['value'] > 1))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'stale': 1})
+
+    def test_size(self):
+        cache = DiskCache(self.cache_dir)
+        cache.set(hash_key('a'), {'value': 1})
+        # the tracked size of a fresh cache equals the size on disk
+        self.assertEqual(cache.size(), DiskCache(self.cache_dir).size())
+        cache.set(hash_key('a'), {'value': 100})
+        cache.set(hash_key('b'), {'value': 2})
+        self.assertEqual(cache.size(), DiskCache(self.cache_dir).size())
+
+    def test_evict_lru(self):
+        cache = DiskCache(self.cache_dir, max_size=250)
+        keys = [hash_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.set(key, {'value': 'x' * 50})
+            # make sure the mtime is in order
+            os.utime(cache._path(key), (time.time() - 10 + i, time.time() - 10 + i))
+        # touch the oldest one so that the second one is evicted
+        cache.get(keys[0])
+        cache.set(hash_key(3), {'value': 'x' * 50})
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertLessEqual(cache.size(), 250)
+
+    def test_prune(self):
+        cache = DiskCache(self.cache_dir)
+        cache.set(hash_key('a'), {'prompt_sha': 'a'})
+        cache.set(hash_key('b'), {'prompt_sha': 'b'})
+        removed = cache.prune(lambda entry: entry['prompt_sha'] != 'a')
+        self.assertEqual(removed, 1)
+        self.assertIsNotNone(cache.get(hash_key('a')))
+        self.assertIsNone(cache.get(hash_key('b')))
@@ -0,0 +1,35 @@
+from unittest import TestCase, mock
+import tempfile
+import json
+import os
+
+from auto_assist import config
+
+
+class TestConfig(TestCase):
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = os.path.join(tmp_dir, 'config.json')
+            self.assertEqual(config.get('a', None, config_file=config_file), None)
+            config.set('a', 1, config_file=config_file)
+
+            with mock.patch('json.load', wraps=json.load) as load:
+                self.assertEqual(config.get('a', config_file=config_file), 1)
+                self.assertEqual(config.get('a', config_file=config_file), 1)
+                self.assertEqual(load.call_count, 1)
+
+                # the cache is invalidated when the file changes
+                with open(config_file, 'w') as f:
+                    json.dump({'a': 22}, f)
+                st = os.stat(config_file)
+                os.utime(config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+                self.assertEqual(config.get('a', config_file=config_file), 22)
+                self.assertEqual(load.call_count, 2)
+
+            # load and get return copies that can be changed safely
+            config.load(config_file=config_file)['a'] = 3
+            self.assertEqual(config.get('a', config_file=config_file), 22)
+            config.set('args', ['--a'], config_file=config_file)
+            config.get('args', config_file=config_file).append('--b')
+            self.assertEqual(config.get('args', config_file=config_file), ['--a'])
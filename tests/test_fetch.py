@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+import httpx
+
+from auto_assist.fetch import needs_browser, get_html_encoding
+
+
+def make_response(text, status_code=200, headers=None):
+    headers = {'content-type': 'text/html; charset=utf-8', **(headers or {})}
+    return httpx.Response(status_code, headers=headers, text=text)
+
+
+class TestNeedsBrowser(TestCase):
+
+    def test_static_page(self):
+        body = '<p>' + 'Professor of Chemistry. ' * 20 + '</p>'
+        self.assertIsNone(needs_browser(make_response(f'<html><title>Faculty</title><body>{body}</body></html>')))
+
+    def test_fallback(self):
+        self.assertEqual(needs_browser(make_response('blocked', 403, {'server': 'cloudflare'})), 'cloudflare')
+        self.assertIn('challenge', needs_browser(make_response('<title>Just a moment...</title>')))  # type: ignore
+        spa = '<html><body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div></body></html>'
+        self.assertEqual(needs_browser(make_response(spa)), 'javascript required')
+        self.assertIn('content type', needs_browser(make_response('%PDF', headers={'content-type': 'application/pdf'})))  # type: ignore
+
+    def test_gbk_page(self):
+        body = '<p>' + '化学系教授，研究方向为有机合成。' * 20 + '</p>'
+        html = f'<html><head><meta charset="gbk"><title>教师名录</title></head><body>{body}</body></html>'
+        # the header has no charset, httpx would decode it as utf-8
+        res = httpx.Response(200, headers={'content-type': 'text/html'}, content=html.encode('gbk'))
+        self.assertIsNone(needs_browser(res))
+        self.assertEqual(res.text, html)
+        # without any declaration the encoding is detected
+        res = httpx.Response(200, headers={'content-type': 'text/html'},
+                             content=html.replace('<meta charset="gbk">', '').encode('gbk'))
+        self.assertIn(get_html_encoding(res), ('gbk', 'gb18030', 'gb2312'))
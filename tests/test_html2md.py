@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from auto_assist.html2md import html_to_markdown
+from auto_assist.lib import clean_soup
+from auto_assist.html2md import soup_to_markdown
+
+html = """
+<html><head><title>Faculty</title><style>p {}</style></head><body>
+<h2>Faculty  of
+ Chemistry</h2>
+<p>Welcome to <b>our</b> department.</p>
+<ul><li>Alice<ul><li>Assistant Professor</li></ul></li><li>Bob</li></ul>
+<table><tr><th>Name</th><th>Title</th></tr><tr><td>Carol</td><td>Professor</td></tr></table>
+<script>alert(1)</script>
+</body></html>
+"""
+
+expected = """## Faculty of Chemistry
+
+Welcome to **our** department.
+
+- Alice
+
+  - Assistant Professor
+- Bob
+
+| Name | Title |
+|---|---|
+| Carol | Professor |
+"""
+
+
+class TestHtml2Md(TestCase):
+
+    def test_html_to_markdown(self):
+        self.assertEqual(html_to_markdown(html), expected)
+
+    def test_soup_to_markdown(self):
+        self.assertEqual(soup_to_markdown(clean_soup(html)), expected)
@@ -0,0 +1,179 @@
+from unittest import TestCase
+import tempfile
+import asyncio
+import time
+import os
+
+from auto_assist.domain.hunter import (
+    HunterCmd, PageJob, collect_faculties, collect_groups, dedup_urls, merge_records, write_extracted,
+)
+from auto_assist.jsonl import JsonlWriter
+from auto_assist.scheduler import HostScheduler, THROTTLED
+from auto_assist.lib import json_dump_file
+
+
+def write_jsonl(path, records):
+    with JsonlWriter(path) as writer:
+        writer.write_all(records)
+
+
+class FakeResponse:
+
+    def __init__(self, status):
+        self.status = status
+        self.headers = {}
+
+
+class FakePage:
+
+    def __init__(self, status, title='Group Members'):
+        self._status = status
+        self._title = title
+
+    async def goto(self, url, **kwargs):
+        return FakeResponse(self._status)
+
+    async def title(self):
+        return self._title
+
+    async def wait_for_function(self, *args, **kwargs):
+        # the challenge is never solved
+        from playwright.async_api import Error
+        raise Error('timeout')
+
+    async def content(self):
+        return f'<html><title>{self._title}</title></html>'
+
+
+class ThrottledFetcher:
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+
+    async def fetch_response(self, url, **kwargs):
+        self._scheduler.report(url, THROTTLED)
+        return None
+
+
+class TestHunter(TestCase):
+
+    def test_throttled_once(self):
+        hunter = HunterCmd(page_cache_dir='', ready_strategy='domcontentloaded')
+        hunter._scheduler = HostScheduler(penalty=0.01)
+        page = FakePage(503, title='Just a moment...')
+        asyncio.run(hunter._async_scrape_page('https://a.edu/', page))  # type: ignore
+        self.assertEqual(hunter._scheduler.stats()['a.edu']['throttled'], 1)
+
+    def test_browser_fallback_wait_pause(self):
+        hunter = HunterCmd(page_cache_dir='', ready_strategy='domcontentloaded')
+        hunter._scheduler = HostScheduler(penalty=0.2)
+        hunter._fetcher = ThrottledFetcher(hunter._scheduler)  # type: ignore
+        start = time.monotonic()
+        result = asyncio.run(hunter._async_fetch_url('https://a.edu/', FakePage(200)))  # type: ignore
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(result.status, 200)
+
+    def test_scrape_not_cache_error_page(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            hunter = HunterCmd(page_cache_dir=tmp_dir, ready_strategy='domcontentloaded')
+            # each page is on its own host, as a throttled host is paused by the scheduler
+            pages = [
+                ('https://a.edu/error', FakePage(503)),
+                ('https://b.edu/challenge', FakePage(200, title='Just a moment...')),
+                ('https://c.edu/ok', FakePage(200)),
+            ]
+            for url, page in pages:
+                asyncio.run(hunter._async_scrape_url(url, page))  # type: ignore
+            cache = hunter._page_cache
+            assert cache is not None
+            self.assertIsNone(cache.get('https://a.edu/error'))
+            self.assertIsNone(cache.get('https://b.edu/challenge'))
+            self.assertIsNotNone(cache.get('https://c.edu/ok'))
+
+    def test_fail_error_page(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            hunter = HunterCmd(page_cache_dir='', ready_strategy='domcontentloaded', max_job_errors=1)
+            html_file = os.path.join(tmp_dir, 'faculty.html')
+            with self.assertRaises(RuntimeError):
+                asyncio.run(hunter._async_process_url('https://a.edu/', html_file, tmp_dir,
+                                                      FakePage(503), 'faculty'))  # type: ignore
+            store = hunter._get_job_store(tmp_dir)
+            self.assertTrue(store.is_failed('faculty.html'))
+            self.assertEqual(store.get('faculty.html').stage, '')  # type: ignore
+            store.close()
+
+    def test_convert_stage_mark_cleaned(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # the conversion fails after the cleaned html is saved
+            hunter = HunterCmd(pandoc_cmd='false', pandoc_opt='')
+            store = hunter._get_job_store(tmp_dir)
+            html_file = os.path.join(tmp_dir, 'faculty.html')
+            job = PageJob(store, 'faculty.html', 'https://a.edu/', '<p>hello</p>', html_file, 'faculty', False, False)
+            with self.assertRaises(Exception):
+                asyncio.run(hunter._async_convert_stage(job))
+            self.assertTrue(os.path.exists(html_file))
+            self.assertEqual(store.get('faculty.html').stage, 'cleaned')  # type: ignore
+            store.close()
+
+    def test_merge_records(self):
+        chunks = [
+            [{'name': 'Wei Zhang', 'title': 'PhD'}, {'name': 'Wei Zhang', 'title': 'Postdoc'}, {'title': 'PhD'}],
+            [{'name': 'wei zhang', 'email': 'wz@a.edu'}, {'title': 'Master'}, {'name': 'Alice'}],
+        ]
+        self.assertEqual(merge_records(chunks), [
+            {'name': 'Wei Zhang', 'title': 'PhD', 'email': 'wz@a.edu'},
+            {'name': 'Wei Zhang', 'title': 'Postdoc'},
+            {'title': 'PhD'},
+            {'title': 'Master'},
+            {'name': 'Alice'},
+        ])
+
+    def test_write_empty_records(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_file = os.path.join(tmp_dir, 'group.html.md.jsonl')
+            write_extracted(out_file, 'group', [])
+            with open(out_file, encoding='utf-8') as f:
+                self.assertEqual(f.read(), '')
+
+    def test_dedup_urls(self):
+        urls = ['https://a.edu/people', 'https://a.edu/people?page=1', 'https://b.edu/', 'https://a.edu/people']
+        self.assertEqual(dedup_urls(urls), ['https://a.edu/people', 'https://b.edu/'])
+
+    def test_collect_faculties(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_dump_file({'FacultyPage': 'https://a.edu/chem/people?page=1', 'Institute': 'A'},
+                           os.path.join(tmp_dir, 'index.json'))
+            write_jsonl(os.path.join(tmp_dir, 'faculty.html.md.jsonl'), [
+                {'name': 'Alice', 'title': 'Assistant Professor', 'profile_url': '/alice'},
+                {'name': 'Bob', 'title': 'Professor', 'profile_url': '/bob'},
+                {'name': 'Carol', 'title': 'APROF', 'profile_url': 'carol'},
+                {'name': 'Dan', 'title': 'Assistant Prof.', 'profile_url': 'https://b.edu/dan'},
+                {'name': 'Eve', 'title': 'Assistant Professor'},
+                {'name': 'Frank'},
+            ])
+            df = collect_faculties([tmp_dir])
+        self.assertEqual(df['name'].tolist(), ['Alice', 'Carol', 'Dan', 'Eve'])
+        self.assertEqual(df['profile_url'].tolist()[:3],
+                         ['https://a.edu/alice', 'https://a.edu/chem/peoplecarol', 'https://b.edu/dan'])
+        self.assertEqual(df['institute'].tolist(), ['A'] * 4)
+        self.assertNotIn('_file', df)
+
+    def test_collect_groups(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_dump_file({'institute': 'A', 'group': 'G', 'advisor': 'Adv'}, os.path.join(tmp_dir, 'index.json'))
+            json_dump_file([{'url': 'https://a.edu/g'}, {'url': 'https://github.com/g'}],
+                           os.path.join(tmp_dir, 'google-search.json'))
+            write_jsonl(os.path.join(tmp_dir, 'group-0.jsonl'), [
+                {'name': 'Xiaoming Li', 'title': 'PhD Student'},
+                {'name': 'xiaoming li', 'title': 'Postdoc'},
+                {'name': 'Alice Smith', 'title': 'PhD Student'},
+                {'name': 'Robert Brown', 'title': '', 'is_chinese': True},
+                {'name': 'Wei Zhang', 'title': 'Undergraduate Student'},
+                {'name': 'Mei Chen'},
+            ])
+            group_df, candidate_df = collect_groups([tmp_dir])
+        self.assertEqual(group_df.to_dict('records'),
+                         [{'institute': 'A', 'group': 'G', 'advisor': 'Adv', 'urls': 'https://a.edu/g'}])
+        self.assertEqual(candidate_df['name'].tolist(), ['Xiaoming Li', 'Robert Brown', 'Mei Chen'])
+        self.assertEqual(candidate_df['advisor'].tolist(), ['Adv'] * 3)
+        self.assertEqual(candidate_df['description'].tolist(), [''] * 3)
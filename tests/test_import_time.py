@@ -0,0 +1,44 @@
+from unittest import TestCase
+from typing import Dict
+
+import subprocess
+import sys
+
+# heavy dependencies that must be imported only by the commands that use them
+HEAVY_MODULES = ('pandas', 'openai', 'playwright', 'bs4', 'httpx')
+
+
+def import_times(code: str) -> Dict[str, int]:
+    """
+    Run code in a new interpreter with -X importtime and return the cumulative import time in us of each module
+    """
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         capture_output=True, text=True, check=True)
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(TestCase):
+
+    def assert_not_imported(self, times: Dict[str, int], modules):
+        imported = [name for name in times if name.split('.')[0] in modules]
+        self.assertEqual(imported, [])
+
+    def test_cli(self):
+        times = import_times('from auto_assist import MainCmd; MainCmd().config()')
+        self.assert_not_imported(times, HEAVY_MODULES)
+        # the budget is generous to avoid flaky failures, a heavy dependency costs more than this alone
+        self.assertLess(times['auto_assist'] + times['auto_assist.config'], 300_000)
+
+    def test_hunter(self):
+        times = import_times('import auto_assist.domain.hunter')
+        self.assert_not_imported(times, ('pandas', 'openai', 'bs4'))
+
+    def test_google_scholar(self):
+        times = import_times('import auto_assist.domain.google_scholar')
+        self.assert_not_imported(times, ('pandas', 'openai', 'bs4'))
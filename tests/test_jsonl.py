@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+import tempfile
+import math
+import io
+import os
+
+from auto_assist.jsonl import iter_jsonl, loads, JsonlWriter
+from auto_assist.lib import jsonl_dump, jsonl_loads
+
+
+class TestJsonl(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_read(self):
+        # 2 ** 70 + 1 can not be represented as a float
+        records = [{'name': '张三', 'i': i, 'big': 2 ** 70 + 1} for i in range(100)]
+        for name in ('data.jsonl', 'data.jsonl.gz'):
+            path = os.path.join(self.tmp_dir.name, name)
+            with JsonlWriter(path, flush_size=100) as writer:
+                writer.write_all(records)
+            self.assertEqual(writer.count, 100)
+            self.assertEqual(list(iter_jsonl(path)), records)
+
+    def test_loads_json_compat(self):
+        self.assertEqual(loads('{"big": %d, "id": "%d"}' % (2 ** 70 + 1, 2 ** 70)), {'big': 2 ** 70 + 1, 'id': str(2 ** 70)})
+        data = loads(b'[NaN, Infinity, -Infinity, 1]')
+        self.assertTrue(math.isnan(data[0]))
+        self.assertEqual(data[1:], [math.inf, -math.inf, 1])
+
+    def test_lib_compat(self):
+        records = [{'name': '张三'}, {'name': 'a'}]
+        buf = io.StringIO()
+        jsonl_dump(buf, records)
+        self.assertNotIn('\\u', buf.getvalue())
+        self.assertEqual(jsonl_loads(buf.getvalue() + '\n\n'), records)
+
+    def test_line_separator_in_value(self):
+        records = [{'name': 'a\u2028b\u2029c\x85d\x1ce'}, {'name': 'f'}]
+        buf = io.StringIO()
+        jsonl_dump(buf, records)
+        self.assertIn('\u2028', buf.getvalue())
+        self.assertEqual(jsonl_loads(buf.getvalue()), records)
@@ -1,6 +1,20 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 
-from auto_assist.lib import url_to_key, get_md_code_block
+import glob
+import re
+import os
+
+from auto_assist.lib import (
+    url_to_key, get_md_code_block, group_by_key, clean_html, split_pinyin, is_chinese_name, is_chinese_names,
+)
+from auto_assist.html2md import html_to_markdown
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
 
 md_text = """
 ```json
@@ -17,4 +31,46 @@ class TestLib(TestCase):
 
     def test_get_md_code_block(self):
         data = next(get_md_code_block(md_text, '```json')).strip()
-        self.assertEqual(data, '{"key": "value"}')
\ No newline at end of file
+        self.assertEqual(data, '{"key": "value"}')
+
+    def test_group_by_key(self):
+        groups = group_by_key(['a1', 'b1', 'a2', 'c1', 'b2'], lambda s: s[0])
+        self.assertEqual(groups, [['a1', 'a2'], ['b1', 'b2'], ['c1']])
+
+    def test_split_pinyin(self):
+        self.assertEqual(split_pinyin('Xiaoming'), ('xiao', 'ming'))
+        self.assertEqual(split_pinyin('xian'), ('xian',))
+        self.assertIsNone(split_pinyin('Smith'))
+        self.assertIsNone(split_pinyin(''))
+
+    def test_is_chinese_name(self):
+        for name in ['San Zhang', 'Xiaoming Wang', 'Zhang-Wei', 'Wang, Xiaoming', 'Ouyang Xiu', "Xi'an Liu"]:
+            self.assertTrue(is_chinese_name(name), name)
+        for name in ['Alice Smith', 'Diana', 'J. K.', '', 'Xiaoming',
+                     # western names that can be split into pinyin
+                     'Susan Smith', 'Linda Brown', 'Lisa Wong', 'Tina Turner', 'Julian Bell',
+                     'Dana Scully', 'Nina Simone', 'Bianca Jagger']:
+            self.assertFalse(is_chinese_name(name), name)
+        self.assertTrue(is_chinese_name('Xiaoming', concatenated=True))
+
+    def test_is_chinese_names(self):
+        import pandas as pd
+        names = pd.Series(['Xiaoming Li', 'Alice Smith', None, 'Xiaoming Li'], index=[3, 2, 1, 0])
+        result = is_chinese_names(names)
+        self.assertEqual(result.tolist(), [True, False, False, True])
+        self.assertEqual(result.index.tolist(), [3, 2, 1, 0])
+
+    @skipUnless(lxml, 'lxml is not installed')
+    def test_clean_html_lxml(self):
+        html_files = glob.glob(os.path.join(FIXTURE_DIR, 'html', '*.html'))
+        self.assertTrue(html_files)
+        for html_file in html_files:
+            with open(html_file, encoding='utf-8') as f:
+                markup = f.read()
+            for keep_attrs in (False, True):
+                expected = clean_html(markup, keep_attrs=keep_attrs)
+                actual = clean_html(markup, keep_attrs=keep_attrs, parser='lxml')
+                # lxml drops the whitespace outside of the root element
+                self.assertEqual(re.sub(r'>\s+<html', '><html', actual),
+                                 re.sub(r'>\s+<html', '><html', expected), html_file)
+                self.assertEqual(html_to_markdown(actual), html_to_markdown(expected), html_file)
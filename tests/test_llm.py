@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+import asyncio
+
+from auto_assist.llm import split_markdown, estimate_tokens, get_openai_client
+
+md_text = '\n'.join([
+    '# Faculty',
+    '',
+    '## Professors',
+    '',
+    *[f'- Person {i}, Professor of Chemistry' for i in range(50)],
+    '',
+    '## Staff',
+    '',
+    *[f'- Staff {i}' for i in range(20)],
+])
+
+
+class TestLlm(TestCase):
+
+    def test_split_markdown_small(self):
+        self.assertEqual(split_markdown(md_text, 10000), [md_text])
+
+    def test_split_markdown(self):
+        chunks = split_markdown(md_text, 100)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 100)
+            # the heading is repeated in every chunk
+            self.assertTrue(chunk.startswith('#'), chunk)
+        text = '\n'.join(chunks)
+        for i in range(50):
+            self.assertEqual(text.count(f'- Person {i},'), 1)
+        for i in range(20):
+            self.assertEqual(text.count(f'- Staff {i}\n') + text.endswith(f'- Staff {i}'), 1)
+
+    def test_split_nested_headings(self):
+        lines = []
+        for depth in range(1, 7):
+            lines += ['#' * depth + f' Section {depth} of the department of chemistry and biology', '']
+            lines += [f'Paragraph {i} about the research of the group at level {depth}. ' * 3 for i in range(10)]
+            lines += ['']
+        lines.append('word ' * 200)
+        md = '\n'.join(lines)
+        for max_tokens in (30, 50, 100):
+            chunks = split_markdown(md, max_tokens)
+            for chunk in chunks:
+                self.assertLessEqual(estimate_tokens(chunk), max_tokens, chunk)
+
+    def test_split_long_line(self):
+        chunks = split_markdown('word ' * 1000, 100)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), 'word ' * 1000)
+
+    def test_get_openai_client(self):
+        async def get_clients():
+            return (get_openai_client('http://localhost/v1', 'a'),
+                    get_openai_client('http://localhost/v1', 'a'),
+                    get_openai_client('http://localhost/v1', 'b'))
+
+        a1, a2, b = asyncio.run(get_clients())
+        self.assertIs(a1, a2)
+        self.assertIsNot(a1, b)
+        # a new event loop gets a new client
+        self.assertIsNot(asyncio.run(get_clients())[0], a1)
+        # the clients are closed with their event loop
+        self.assertTrue(a1.is_closed())
+        self.assertTrue(b.is_closed())
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from auto_assist.mdprune import prune_markdown, restore_urls
+
+md_text = """Skip to main content
+
+-   [Home](/)
+-   [About](/about)
+-   [People](/people)
+
+# Faculty {#faculty .title}
+
+::: {.cards}
+![photo](/img/alice.jpg)
+
+-   [Alice Smith](https://www.chem.example.edu/people/faculty/alice-smith)
+-   [Bob Jones](/people/bob)
+
+Assistant    Professor   of Chemistry
+:::
+
+© 2024 Example University. All rights reserved.
+"""
+
+expected = """# Faculty
+
+- [Alice Smith](u:1)
+- [Bob Jones](/people/bob)
+
+Assistant Professor of Chemistry
+"""
+
+
+class TestMdPrune(TestCase):
+
+    def test_prune_markdown(self):
+        pruned, url_map = prune_markdown(md_text)
+        self.assertEqual(pruned, expected)
+        self.assertEqual(url_map, {'u:1': 'https://www.chem.example.edu/people/faculty/alice-smith'})
+
+    def test_keep_member_list(self):
+        # a list of links that are not navigation words is kept
+        md = '\n'.join(f'- [Person {i}](/people/{i})' for i in range(5))
+        pruned, _ = prune_markdown(md)
+        self.assertEqual(pruned, md + '\n')
+
+    def test_keep_body_line(self):
+        # a line in the middle of the page that mentions a boilerplate word is kept
+        members = [f'- Person {i}, PhD student' for i in range(20)]
+        bio = 'Alice works on the privacy policy of genomic data and the accessibility of lab tools.'
+        footer = '[Privacy Policy](/privacy) | [Sitemap](/sitemap)'
+        md = '\n'.join(members[:10] + [bio] + members[10:] + [footer])
+        pruned, _ = prune_markdown(md)
+        self.assertIn(bio, pruned)
+        self.assertNotIn('Sitemap', pruned)
+        # links in the middle of the page are boilerplate too
+        md = '\n'.join(members[:10] + [footer] + members[10:])
+        self.assertNotIn('Sitemap', prune_markdown(md)[0])
+
+    def test_restore_urls(self):
+        url_map = {'u:1': 'https://example.org/alice'}
+        data = [{'name': 'Alice', 'profile_url': 'u:1', 'note': 'menu:1'}]
+        self.assertEqual(restore_urls(data, url_map), [
+            {'name': 'Alice', 'profile_url': 'https://example.org/alice', 'note': 'menu:1'}])
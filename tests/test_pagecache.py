@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+import tempfile
+import os
+
+from auto_assist.pagecache import PageCache, normalize_url
+
+
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('HTTPS://Chem.Example.EDU:443/people?b=2&a=1&utm_source=x#top'),
+                         'https://chem.example.edu/people?a=1&b=2')
+        self.assertEqual(normalize_url('http://example.edu'), 'http://example.edu/')
+
+    def test_put_get(self):
+        cache = PageCache(self.cache_dir, ttl=60)
+        self.assertIsNone(cache.get('https://example.edu/a'))
+        entry = cache.put('https://example.edu/a#x', '<html>a\r\n</html>', etag='"v1"')
+        cache.put('https://example.edu/b', '<html>a\r\n</html>')
+
+        entry = cache.get('https://EXAMPLE.edu/a')
+        self.assertIsNotNone(entry)
+        self.assertTrue(cache.is_fresh(entry))  # type: ignore
+        self.assertEqual(entry['etag'], '"v1"')  # type: ignore
+        self.assertEqual(cache.read(entry), '<html>a\r\n</html>')  # type: ignore
+        # the same content is stored once
+        self.assertEqual(len(os.listdir(os.path.dirname(cache.blob_path(entry)))), 1)  # type: ignore
+
+        self.assertFalse(PageCache(self.cache_dir, ttl=0).is_fresh(entry))  # type: ignore
+        self.assertEqual(cache.prune(-1), 2)
+        self.assertIsNone(cache.get('https://example.edu/a'))
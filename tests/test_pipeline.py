@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+import asyncio
+
+from auto_assist.pipeline import Pipeline
+
+
+class TestPipeline(TestCase):
+
+    def test_stages(self):
+        results = []
+        running = {'n': 0, 'max': 0}
+
+        async def _double(x):
+            running['n'] += 1
+            running['max'] = max(running['max'], running['n'])
+            await asyncio.sleep(0.01)
+            running['n'] -= 1
+            if x == 3:
+                raise ValueError('bad item')
+            return x * 2
+
+        async def _skip_odd(x):
+            return x if x % 4 == 0 else None
+
+        async def _collect(x):
+            results.append(x)
+
+        async def _run():
+            pipeline = (Pipeline()
+                        .add_stage('double', _double, concurrency=3, queue_size=2)
+                        .add_stage('filter', _skip_odd)
+                        .add_stage('collect', _collect))
+            async with pipeline:
+                for i in range(10):
+                    await pipeline.put(i)
+            return pipeline.stats()
+
+        stats = asyncio.run(_run())
+        self.assertEqual(sorted(results), [0, 4, 8, 12, 16])
+        self.assertEqual(running['max'], 3)
+        self.assertEqual(stats['double']['failed'], 1)
+        self.assertEqual(stats['collect']['done'], 5)
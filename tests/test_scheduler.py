@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import asyncio
+import time
+
+from auto_assist.scheduler import HostScheduler, OK, THROTTLED
+
+
+class TestHostScheduler(TestCase):
+
+    def test_rate(self):
+        scheduler = HostScheduler(max_concurrency=4, rate=20.)
+
+        async def _run():
+            async def _request(url):
+                async with scheduler.slot(url):
+                    pass
+            start = time.monotonic()
+            await asyncio.gather(*[_request('https://a.edu/') for _ in range(5)],
+                                 *[_request('https://b.edu/') for _ in range(5)])
+            return time.monotonic() - start
+        elapsed = asyncio.run(_run())
+        # 5 requests to each host at 20 req/s, hosts don't block each other
+        self.assertGreater(elapsed, 0.18)
+        self.assertLess(elapsed, 0.5)
+
+    def test_backoff_and_recover(self):
+        scheduler = HostScheduler(rate=0., recover_rate=1., rate_step=0.5, penalty=10.)
+        url = 'https://a.edu/'
+        scheduler.report(url, THROTTLED, retry_after=30)
+        state = scheduler._get_state(url)
+        self.assertEqual(state.rate, 0.5)
+        self.assertGreater(state.penalty_until - time.monotonic(), 29)
+        scheduler.report(url, THROTTLED)
+        self.assertEqual(state.rate, 0.25)
+        self.assertEqual(scheduler.stats()['a.edu']['throttled'], 2)
+        for _ in range(2):
+            scheduler.report(url, OK)
+        # back to unlimited
+        self.assertEqual(state.rate, 0.)
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+import tempfile
+import os
+
+from auto_assist.state import JobStore
+
+
+class TestJobStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'jobs.sqlite')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume(self):
+        store = JobStore(self.db_file, max_errors=2)
+        store.mark('a', 'scraped', url='http://a')
+        store.mark('a', 'converted')
+        store.mark('a', 'cleaned')  # never goes backward
+        store.fail('b', RuntimeError('timeout'), url='http://b')
+        store.fail('b', RuntimeError('timeout'))
+        store.close()
+
+        store = JobStore(self.db_file, max_errors=2)
+        self.assertTrue(store.is_done('a', 'cleaned'))
+        self.assertTrue(store.is_done('a', 'converted'))
+        self.assertFalse(store.is_done('a', 'parsed'))
+        self.assertEqual(store.get('a').url, 'http://a')  # type: ignore
+        self.assertTrue(store.is_failed('b'))
+        self.assertFalse(store.is_failed('a'))
+        store.close()
+
+    def test_adopt_existing_file(self):
+        store = JobStore(self.db_file)
+        path = os.path.join(self.tmp_dir.name, 'faculty.html')
+        self.assertFalse(store.is_done('c', 'cleaned', path))
+        with open(path, 'w') as f:
+            f.write('<html></html>')
+        self.assertTrue(store.is_done('c', 'cleaned', path))
+        self.assertEqual(store.get('c').stage, 'cleaned')  # type: ignore
+        store.close()
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import tempfile
+import json
+import os
+
+from auto_assist.store import JsonlStore
+
+
+class TestJsonlStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_file = os.path.join(self.tmp_dir.name, 'gs_result.jsonl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def open_store(self):
+        return JsonlStore(self.jsonl_file, key_fn=lambda item: item['url'], batch_size=2)
+
+    def test_add_get(self):
+        with self.open_store() as store:
+            for i in range(3):
+                store.add({'url': f'u{i}', 'value': i})
+            self.assertIn('u2', store)  # pending
+            self.assertEqual(store.get('u0'), {'url': 'u0', 'value': 0})
+        with self.open_store() as store:
+            self.assertEqual(len(store), 3)
+            self.assertEqual(list(store.keys()), ['u0', 'u1', 'u2'])
+            self.assertEqual(store.get('u2'), {'url': 'u2', 'value': 2})
+            self.assertIsNone(store.get('u3'))
+
+    def test_index_appended_records(self):
+        with self.open_store() as store:
+            store.add({'url': 'u0', 'value': 0})
+        # records appended by other tools, with a partial line of an interrupted write
+        with open(self.jsonl_file, 'a', encoding='utf-8') as fp:
+            fp.write(json.dumps({'url': 'u1', 'value': '中文'}, ensure_ascii=False) + '\n')
+            fp.write('{"url": "u2"')
+        with self.open_store() as store:
+            self.assertEqual(store.get('u1'), {'url': 'u1', 'value': '中文'})
+            self.assertNotIn('u2', store)
+            store.add({'url': 'u2', 'value': 2})
+        with open(self.jsonl_file, encoding='utf-8') as fp:
+            self.assertEqual([json.loads(line)['url'] for line in fp], ['u0', 'u1', 'u2'])
+
+    def test_last_line_without_newline(self):
+        # jsonl_dump writes files without a trailing newline
+        with open(self.jsonl_file, 'w', encoding='utf-8') as fp:
+            fp.write('{"url": "u0"}\n{"url": "u1"}')
+        with self.open_store() as store:
+            self.assertEqual(store.get('u1'), {'url': 'u1'})
+            store.add({'url': 'u2'})
+        with self.open_store() as store:
+            self.assertEqual(list(store.keys()), ['u0', 'u1', 'u2'])
+
+    def test_none_key(self):
+        with self.open_store() as store:
+            store.add({'url': None, 'value': 0})
+        with self.open_store() as store:
+            self.assertIn(None, store)
+            self.assertEqual(store.get(None), {'url': None, 'value': 0})